@@ -1,13 +1,34 @@
  # ========== Importing Libraries ==========
 import sqlite3
 import datetime
+import csv
+import functools
+import hashlib
+import html
+import io
+import os
+import queue
+import re
+import statistics
+import threading
+import time
+from collections import Counter, OrderedDict, deque, namedtuple
+from tracker_lookups import (BUDGET_PERIODS, FX_RATES_DIRECTORY, FX_RATE_FILES_SETTING, REPORTING_CURRENCY,
+                             ROLLING_BUDGET_DAYS, SCHEMA_VERSION, SCHEMA_VERSION_SETTING, WINDOW_KEYS,
+                             database_path, exchange_rate, get_settings, rate_files_fingerprint, window_spend)
+# concurrent.futures (which brings in logging) is imported by the write queue
+# and statement functions that use it, to keep command-line start-up quick.
 
 
 # ========== Functions ==========
 # ------- Connecting to Database -------
+# Chosen with the TRACKER_DB environment variable (see tracker_lookups.py).
+DATABASE_PATH = database_path()
+
+
 def database_connect():
     try:
-        db = sqlite3.connect('./tracker_app.db') 
+        db = sqlite3.connect(DATABASE_PATH, uri=DATABASE_PATH.startswith("file:"))
         cursor = db.cursor()
         return cursor, db
     except sqlite3.Error as e:
@@ -16,6 +37,280 @@ def database_connect():
         return None, None
 
 
+# ------- Streaming Rows -------
+# Large result sets are read in fetchmany batches and handed out one record at
+# a time, so memory use stays the same however many rows a query returns.
+# Records are namedtuples, which carry no per-instance dictionary.
+STREAM_BATCH_SIZE = 500
+
+ExpenseRecord = namedtuple("ExpenseRecord", "id date description expense_category expense_amount currency")
+IncomeRecord = namedtuple("IncomeRecord", "id date description income_category income_amount currency")
+GoalRecord = namedtuple("GoalRecord", "id goal target_date target_amount")
+
+
+def stream_rows(cursor, record_type=None, batch_size=STREAM_BATCH_SIZE):
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        for row in rows:
+            yield record_type._make(row) if record_type else row
+
+
+# ------- Write Queue -------
+# Callers that make many small writes (imports, scripts, API handlers) can
+# submit them to a WriteQueue instead of committing each row. A background
+# thread gathers operations from every caller into one transaction. A batch is
+# committed once WRITE_BATCH_SIZE operations are gathered, or once the queue is
+# empty and WRITE_COMMIT_INTERVAL seconds have passed since the batch started.
+# With the default interval of 0, whatever queues up during one commit becomes
+# the next batch, so busy periods batch themselves. Each operation runs inside
+# its own savepoint, so one failing statement does not undo the rest of the
+# batch. A caller's Future only resolves once its batch has been committed.
+# If the writer thread itself fails (for example, the database cannot be
+# opened), every pending and later Future fails with that error rather than
+# waiting forever. Submitting to a closed queue raises ProgrammingError.
+WRITE_BATCH_SIZE = 500
+WRITE_COMMIT_INTERVAL = 0.0
+
+WriteResult = namedtuple("WriteResult", "lastrowid rowcount")
+
+
+class WriteQueue:
+    def __init__(self, database_path=None, batch_size=WRITE_BATCH_SIZE,
+                 commit_interval=WRITE_COMMIT_INTERVAL):
+        self.database_path = database_path or DATABASE_PATH
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self.operations = queue.Queue()
+        self.state_lock = threading.Lock()
+        self.closed = False
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name="write-queue", daemon=True)
+        self.thread.start()
+
+    def submit(self, sql, params=()):
+        from concurrent.futures import Future
+        future = Future()
+        with self.state_lock:
+            if self.error is not None:
+                future.set_exception(self.error)
+                return future
+            if self.closed or not self.thread.is_alive():
+                raise sqlite3.ProgrammingError("Cannot submit to a closed write queue.")
+            self.operations.put((sql, params, future))
+        return future
+
+    def execute(self, sql, params=()):
+        return self.submit(sql, params).result()
+
+    def close(self):
+        with self.state_lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.operations.put(None)
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def next_batch(self):
+        first = self.operations.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.commit_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                operation = self.operations.get(timeout=timeout) if timeout > 0 else self.operations.get_nowait()
+            except queue.Empty:
+                break
+            if operation is None:
+                return batch, True
+            batch.append(operation)
+        return batch, False
+
+    def run(self):
+        batch = []
+        try:
+            self.write_batches(batch)
+        except Exception as e:
+            self.fail(batch, e)
+
+    # Fail the batch in hand and everything still queued. Setting self.error
+    # under the lock means nothing can be queued after the queue is drained.
+    def fail(self, batch, error):
+        with self.state_lock:
+            self.error = error
+        for sql, params, future in batch:
+            if not future.done():
+                future.set_exception(error)
+        while True:
+            try:
+                operation = self.operations.get_nowait()
+            except queue.Empty:
+                break
+            if operation is not None:
+                operation[2].set_exception(error)
+
+    # The batch being written is kept in batch, so run can fail it if this
+    # raises.
+    def write_batches(self, batch):
+        db = sqlite3.connect(self.database_path, isolation_level=None,
+                             uri=self.database_path.startswith("file:"))
+        try:
+            cursor = db.cursor()
+            closing = False
+            while not closing:
+                batch[:], closing = self.next_batch()
+                if not batch:
+                    continue
+                
+                results = []
+                try:
+                    cursor.execute("BEGIN")
+                    for sql, params, future in batch:
+                        cursor.execute("SAVEPOINT operation")
+                        try:
+                            cursor.execute(sql, params)
+                            results.append(WriteResult(cursor.lastrowid, cursor.rowcount))
+                        except sqlite3.Error as e:
+                            cursor.execute("ROLLBACK TO operation")
+                            results.append(e)
+                        cursor.execute("RELEASE operation")
+                    cursor.execute("COMMIT")
+                except sqlite3.Error as e:
+                    if db.in_transaction:
+                        db.rollback()
+                    for sql, params, future in batch:
+                        future.set_exception(e)
+                    continue
+                
+                for (sql, params, future), result in zip(batch, results):
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+        finally:
+            db.close()
+
+
+# The statements every path that records a new expense or income uses.
+EXPENSE_INSERT_SQL = '''
+                     INSERT INTO expense_tracker
+                     (date, description, expense_category, expense_amount, currency)
+                     VALUES (?, ?, ?, ?, ?)'''
+INCOME_INSERT_SQL = '''
+                    INSERT INTO income_tracker
+                    (date, description, income_category, income_amount, currency)
+                    VALUES (?, ?, ?, ?, ?)'''
+
+
+# Queue a new expense. The cached category list is refreshed once it commits.
+def submit_expense(write_queue, date, description, category, amount, currency=None):
+    future = write_queue.submit(EXPENSE_INSERT_SQL,
+                                (date, description, category, amount, currency or REPORTING_CURRENCY))
+    future.add_done_callback(lambda future: cache_invalidate("expense_categories"))
+    return future
+
+
+# Queue a new income. The cached category list is refreshed once it commits.
+def submit_income(write_queue, date, description, category, amount, currency=None):
+    future = write_queue.submit(INCOME_INSERT_SQL,
+                                (date, description, category, amount, currency or REPORTING_CURRENCY))
+    future.add_done_callback(lambda future: cache_invalidate("income_categories"))
+    return future
+
+
+# ------- Metadata Cache -------
+# Category lists, budgets and goals change rarely, so they are kept in a small
+# in-process LRU cache. Each write path invalidates only the keys it affects.
+# The write queue invalidates from its own thread, so every access holds
+# cache_lock. A load also holds it, so an invalidation cannot land between
+# the query and storing its result.
+CACHE_MAX_ENTRIES = 128
+metadata_cache = OrderedDict()
+cache_stats = {"hits": 0, "misses": 0}
+cache_lock = threading.RLock()
+
+
+def cache_lookup(key, loader):
+    with cache_lock:
+        if key in metadata_cache:
+            metadata_cache.move_to_end(key)
+            cache_stats["hits"] += 1
+            return metadata_cache[key]
+        
+        cache_stats["misses"] += 1
+        value = loader()
+        metadata_cache[key] = value
+        if len(metadata_cache) > CACHE_MAX_ENTRIES:
+            metadata_cache.popitem(last=False)
+        return value
+
+
+def cache_invalidate(*keys):
+    with cache_lock:
+        for key in keys:
+            metadata_cache.pop(key, None)
+
+
+# Distinct expense categories currently recorded.
+def get_expense_categories(cursor):
+    def load():
+        cursor.execute('''
+                       SELECT expense_category FROM expense_tracker
+                       UNION
+                       SELECT expense_category FROM expense_splits
+                       ''')
+        return tuple(row[0] for row in cursor.fetchall())
+    return cache_lookup("expense_categories", load)
+
+
+# Distinct income categories currently recorded.
+def get_income_categories(cursor):
+    def load():
+        cursor.execute('''SELECT DISTINCT income_category FROM income_tracker''')
+        return tuple(row[0] for row in cursor.fetchall())
+    return cache_lookup("income_categories", load)
+
+
+# Budget rows (id, category, budget, currency, period) set for a category.
+def get_category_budgets(cursor, category):
+    def load():
+        cursor.execute('''
+                       SELECT id, expense_category, budget, currency, period
+                       FROM budget_tracker WHERE LOWER(expense_category) = LOWER(?)
+                       ORDER BY id
+                       ''', (category,))
+        return tuple(cursor.fetchall())
+    return cache_lookup(("budget", category.lower()), load)
+
+
+# All monthly budgets as (expense_category, budget, currency) rows.
+def get_budgets(cursor):
+    def load():
+        cursor.execute('''
+                       SELECT expense_category, budget, currency FROM budget_tracker
+                       WHERE period = 'monthly' ORDER BY expense_category
+                       ''')
+        return tuple(cursor.fetchall())
+    return cache_lookup("budgets", load)
+
+
+# All financial goals as (id, goal, target_date, target_amount) rows.
+def get_goals(cursor):
+    def load():
+        cursor.execute('''SELECT * FROM financial_goals_tracker''')
+        return tuple(cursor.fetchall())
+    return cache_lookup("goals", load)
+
+
 # ------- Creating Tables -------
 # Create a specific table to record expenses.
 def create_expense_table():
@@ -27,7 +322,8 @@ def create_expense_table():
                        date TEXT, 
                        description TEXT,
                        expense_category TEXT, 
-                       expense_amount REAL
+                       expense_amount REAL,
+                       currency TEXT DEFAULT 'GBP'
                        )
                        ''')
         db.commit()
@@ -47,7 +343,8 @@ def create_income_table():
                        date TEXT,
                        description TEXT,
                        income_category TEXT,
-                       income_amount REAL
+                       income_amount REAL,
+                       currency TEXT DEFAULT 'GBP'
                        )
                        ''')
         db.commit()
@@ -64,8 +361,11 @@ def create_budget_table():
         cursor.execute('''
                        CREATE TABLE IF NOT EXISTS 
                        budget_tracker(id INTEGER PRIMARY KEY,
-                       expense_category TEXT UNIQUE,
-                       budget REAL
+                       expense_category TEXT,
+                       budget REAL,
+                       currency TEXT DEFAULT 'GBP',
+                       period TEXT DEFAULT 'monthly',
+                       UNIQUE (expense_category, period)
                        )
                        ''')
         db.commit()
@@ -94,6 +394,341 @@ def create_goals_table():
         db.rollback()
 
 
+# Create a specific table to record savings contributed towards a financial goal.
+def create_goal_contributions_table():
+    try:
+        cursor, db = database_connect()
+        cursor.execute('''
+                       CREATE TABLE IF NOT EXISTS 
+                       goal_contributions(id INTEGER PRIMARY KEY,
+                       goal_id INTEGER REFERENCES financial_goals_tracker(id),
+                       date TEXT,
+                       amount REAL
+                       )
+                       ''')
+        cursor.execute('''
+                       CREATE INDEX IF NOT EXISTS idx_goal_contributions_goal
+                       ON goal_contributions(goal_id)
+                       ''')
+        db.commit()
+    
+    except sqlite3.Error as e:
+        print(f"\nThe following error occurred: {e}.\n")
+        db.rollback()
+
+
+# Create a specific table to record exchange rates into the reporting currency.
+def create_fx_rates_table():
+    try:
+        cursor, db = database_connect()
+        cursor.execute('''
+                       CREATE TABLE IF NOT EXISTS 
+                       fx_rates(currency TEXT,
+                       date TEXT,
+                       rate REAL,
+                       PRIMARY KEY (currency, date)
+                       ) WITHOUT ROWID
+                       ''')
+        db.commit()
+    
+    except sqlite3.Error as e:
+        print(f"\nThe following error occurred: {e}.\n")
+        db.rollback()
+
+
+# Named values about the database itself, such as its schema version and the
+# rate files last loaded (see tracker_lookups.py).
+def create_settings_table():
+    try:
+        cursor, db = database_connect()
+        cursor.execute('''
+                       CREATE TABLE IF NOT EXISTS 
+                       tracker_settings(name TEXT PRIMARY KEY,
+                       value TEXT
+                       ) WITHOUT ROWID
+                       ''')
+        db.commit()
+    
+    except sqlite3.Error as e:
+        print(f"\nThe following error occurred: {e}.\n")
+        db.rollback()
+
+
+def save_setting(cursor, name, value):
+    cursor.execute('''INSERT OR REPLACE INTO tracker_settings(name, value) VALUES (?, ?)''', (name, value))
+
+
+# Refuse to store expenses, income or budgets in a currency that has no
+# exchange rates, since they could not be converted into any total.
+def create_currency_triggers():
+    try:
+        cursor, db = database_connect()
+        for table in ("expense_tracker", "income_tracker", "budget_tracker"):
+            for event in ("INSERT", "UPDATE OF currency"):
+                trigger = f"{table}_currency_{event.split()[0].lower()}"
+                cursor.execute(f'''DROP TRIGGER IF EXISTS {trigger}''')
+                cursor.execute(f'''
+                               CREATE TRIGGER {trigger} BEFORE {event} ON {table}
+                               WHEN NEW.currency IS NOT NULL AND NEW.currency != '{REPORTING_CURRENCY}'
+                               AND NOT EXISTS (SELECT 1 FROM fx_rates WHERE currency = NEW.currency)
+                               BEGIN
+                               SELECT RAISE(ABORT, 'No exchange rates found for this currency');
+                               END
+                               ''')
+        db.commit()
+    
+    except sqlite3.Error as e:
+        print(f"\nThe following error occurred: {e}.\n")
+        db.rollback()
+
+
+# Create a specific table to record rules for categorising transactions.
+def create_category_rules_table():
+    try:
+        cursor, db = database_connect()
+        cursor.execute('''
+                       CREATE TABLE IF NOT EXISTS 
+                       category_rules(id INTEGER PRIMARY KEY,
+                       kind TEXT DEFAULT 'expense',
+                       match_type TEXT DEFAULT 'keyword',
+                       pattern TEXT,
+                       category TEXT,
+                       min_amount REAL,
+                       max_amount REAL,
+                       source TEXT DEFAULT 'manual'
+                       )
+                       ''')
+        db.commit()
+    
+    except sqlite3.Error as e:
+        print(f"\nThe following error occurred: {e}.\n")
+        db.rollback()
+
+
+# Create indexes used to look up possible duplicates and category history.
+def create_expense_indexes():
+    try:
+        cursor, db = database_connect()
+        cursor.execute('''
+                       CREATE INDEX IF NOT EXISTS idx_expense_amount_date
+                       ON expense_tracker(expense_amount, date)
+                       ''')
+        cursor.execute('''
+                       CREATE INDEX IF NOT EXISTS idx_expense_category_date
+                       ON expense_tracker(expense_category, date)
+                       ''')
+        db.commit()
+    
+    except sqlite3.Error as e:
+        print(f"\nThe following error occurred: {e}.\n")
+        db.rollback()
+
+
+# Create a specific table to record which monthly statements have been generated.
+def create_report_statements_table():
+    try:
+        cursor, db = database_connect()
+        cursor.execute('''
+                       CREATE TABLE IF NOT EXISTS 
+                       report_statements(month TEXT,
+                       format TEXT,
+                       fingerprint TEXT,
+                       path TEXT,
+                       generated_at TEXT,
+                       PRIMARY KEY (month, format)
+                       )
+                       ''')
+        db.commit()
+    
+    except sqlite3.Error as e:
+        print(f"\nThe following error occurred: {e}.\n")
+        db.rollback()
+
+
+# Add currency columns to databases created before currencies were supported.
+def add_currency_columns():
+    try:
+        cursor, db = database_connect()
+        for table in ("expense_tracker", "income_tracker", "budget_tracker"):
+            cursor.execute(f"PRAGMA table_info({table})")
+            columns = [row[1] for row in cursor.fetchall()]
+            if "currency" not in columns:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN currency TEXT DEFAULT 'GBP'")
+        db.commit()
+    
+    except sqlite3.Error as e:
+        print(f"\nThe following error occurred: {e}.\n")
+        db.rollback()
+
+
+# Create tables for splitting an expense across categories and for tagging
+# expenses. An expense's own category keeps whatever part of its amount has not
+# been split off, which is tracked in expense_tracker.split_amount. The
+# expense_lines view lists every split line plus each remainder, so category
+# totals taken over it never count the same money twice.
+def create_split_and_tag_tables():
+    try:
+        cursor, db = database_connect()
+        cursor.execute("PRAGMA table_info(expense_tracker)")
+        if "split_amount" not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute('''ALTER TABLE expense_tracker ADD COLUMN split_amount REAL NOT NULL DEFAULT 0''')
+        cursor.execute('''
+                       CREATE TABLE IF NOT EXISTS 
+                       expense_splits(id INTEGER PRIMARY KEY,
+                       expense_id INTEGER REFERENCES expense_tracker(id),
+                       expense_category TEXT,
+                       amount REAL
+                       )
+                       ''')
+        cursor.execute('''
+                       CREATE INDEX IF NOT EXISTS idx_expense_splits_expense
+                       ON expense_splits(expense_id)
+                       ''')
+        cursor.execute('''
+                       CREATE INDEX IF NOT EXISTS idx_expense_splits_category
+                       ON expense_splits(expense_category, expense_id, amount)
+                       ''')
+        cursor.execute('''
+                       CREATE TABLE IF NOT EXISTS 
+                       tags(id INTEGER PRIMARY KEY,
+                       name TEXT UNIQUE
+                       )
+                       ''')
+        cursor.execute('''
+                       CREATE TABLE IF NOT EXISTS 
+                       expense_tags(tag_id INTEGER REFERENCES tags(id),
+                       expense_id INTEGER REFERENCES expense_tracker(id),
+                       PRIMARY KEY (tag_id, expense_id)
+                       ) WITHOUT ROWID
+                       ''')
+        cursor.execute('''
+                       CREATE INDEX IF NOT EXISTS idx_expense_tags_expense
+                       ON expense_tags(expense_id, tag_id)
+                       ''')
+        cursor.execute('''
+                       CREATE VIEW IF NOT EXISTS expense_lines AS
+                       SELECT expense_tracker.id AS expense_id, expense_tracker.date AS date,
+                       expense_splits.expense_category AS expense_category,
+                       expense_splits.amount AS amount, expense_tracker.currency AS currency
+                       FROM expense_splits JOIN expense_tracker ON expense_tracker.id = expense_splits.expense_id
+                       UNION ALL
+                       SELECT id, date, expense_category, expense_amount - split_amount, currency
+                       FROM expense_tracker WHERE expense_amount != split_amount
+                       ''')
+        
+        # Split lines may never add up to more than their expense, so no
+        # remainder is ever negative.
+        cursor.execute('''DROP TRIGGER IF EXISTS expense_amount_below_splits''')
+        cursor.execute('''
+                       CREATE TRIGGER expense_amount_below_splits
+                       BEFORE UPDATE OF expense_amount ON expense_tracker
+                       WHEN NEW.expense_amount < OLD.split_amount - 0.005
+                       BEGIN
+                       SELECT RAISE(ABORT, 'The amount cannot be lower than the split lines of the expense');
+                       END
+                       ''')
+        cursor.execute('''DROP TRIGGER IF EXISTS split_over_expense''')
+        cursor.execute('''
+                       CREATE TRIGGER split_over_expense BEFORE INSERT ON expense_splits
+                       WHEN NEW.amount > (SELECT expense_amount - split_amount FROM expense_tracker
+                                          WHERE id = NEW.expense_id) + 0.005
+                       BEGIN
+                       SELECT RAISE(ABORT, 'The split lines cannot add up to more than the expense');
+                       END
+                       ''')
+        cursor.execute('''DROP TRIGGER IF EXISTS expense_delete_splits''')
+        cursor.execute('''
+                       CREATE TRIGGER expense_delete_splits AFTER DELETE ON expense_tracker
+                       BEGIN
+                       DELETE FROM expense_splits WHERE expense_id = OLD.id;
+                       DELETE FROM expense_tags WHERE expense_id = OLD.id;
+                       END
+                       ''')
+        db.commit()
+    
+    except sqlite3.Error as e:
+        print(f"\nThe following error occurred: {e}.\n")
+        db.rollback()
+
+
+# Rebuild budget tables created before budget periods were supported, so that
+# a category can hold one budget per period.
+def upgrade_budget_table():
+    try:
+        cursor, db = database_connect()
+        cursor.execute("PRAGMA table_info(budget_tracker)")
+        if "period" in [row[1] for row in cursor.fetchall()]:
+            return
+        cursor.execute('''ALTER TABLE budget_tracker RENAME TO budget_tracker_old''')
+        cursor.execute('''
+                       CREATE TABLE budget_tracker(id INTEGER PRIMARY KEY,
+                       expense_category TEXT,
+                       budget REAL,
+                       currency TEXT DEFAULT 'GBP',
+                       period TEXT DEFAULT 'monthly',
+                       UNIQUE (expense_category, period)
+                       )
+                       ''')
+        cursor.execute('''
+                       INSERT INTO budget_tracker(id, expense_category, budget, currency)
+                       SELECT id, expense_category, budget, currency FROM budget_tracker_old
+                       ''')
+        cursor.execute('''DROP TABLE budget_tracker_old''')
+        db.commit()
+    
+    except sqlite3.Error as e:
+        print(f"\nThe following error occurred: {e}.\n")
+        db.rollback()
+
+
+# Create tables holding running spend per budget window, and the triggers that
+# keep them up to date on every insert, edit and delete of an expense.
+def create_budget_window_tables():
+    try:
+        cursor, db = database_connect()
+        cursor.execute('''SELECT 1 FROM sqlite_master WHERE name = 'budget_window_totals' ''')
+        backfill = cursor.fetchone() is None
+        cursor.execute('''
+                       CREATE TABLE IF NOT EXISTS 
+                       budget_window_totals(expense_category TEXT,
+                       granularity TEXT,
+                       window_key TEXT,
+                       total REAL,
+                       PRIMARY KEY (expense_category, granularity, window_key)
+                       ) WITHOUT ROWID
+                       ''')
+        cursor.execute('''
+                       CREATE TABLE IF NOT EXISTS 
+                       budget_alerts(expense_category TEXT,
+                       period TEXT,
+                       window_key TEXT,
+                       threshold REAL,
+                       spent REAL,
+                       budget REAL,
+                       raised_at TEXT,
+                       PRIMARY KEY (expense_category, period, window_key, threshold)
+                       ) WITHOUT ROWID
+                       ''')
+        for trigger_sql in budget_window_triggers():
+            cursor.execute(trigger_sql)
+        
+        # Totals kept by older versions may hold NULLs, 'yyyy-Www' week keys or
+        # categories that are not lower case.
+        cursor.execute('''
+                       SELECT 1 FROM budget_window_totals
+                       WHERE total IS NULL OR (granularity = 'weekly' AND window_key LIKE '%-W%')
+                       OR expense_category != LOWER(expense_category)
+                       LIMIT 1
+                       ''')
+        if backfill or cursor.fetchone():
+            rebuild_budget_window_totals(cursor)
+        db.commit()
+    
+    except sqlite3.Error as e:
+        print(f"\nThe following error occurred: {e}.\n")
+        db.rollback()
+
+
 # ------- Pre-Populating Tables -------
 # Populating expense tracker with data.
 def insert_prepopulated_expenses():
@@ -204,15 +839,481 @@ def insert_prepopulated_goals():
         db.rollback()
 
 
+# ------- Currencies -------
+# All totals are reported in REPORTING_CURRENCY. Exchange rates are read from
+# CSV files in FX_RATES_DIRECTORY (see tracker_lookups.py). The files are only
+# read again once their names, sizes or modification times change, so an
+# unchanged rates folder costs a few stat calls and no writes.
+def load_fx_rates(directory=FX_RATES_DIRECTORY):
+    fingerprint = rate_files_fingerprint(directory)
+    if fingerprint is None:
+        return
+    try:
+        cursor, db = database_connect()
+        if get_settings(cursor).get(FX_RATE_FILES_SETTING) == fingerprint:
+            db.close()
+            return
+        cursor.execute('''SELECT COUNT(*), TOTAL(rate), MAX(date) FROM fx_rates''')
+        rates_before = cursor.fetchone()
+        for file_name in sorted(os.listdir(directory)):
+            if not file_name.endswith(".csv"):
+                continue
+            with open(os.path.join(directory, file_name), newline='') as rates_file:
+                cursor.executemany('''
+                                   INSERT OR REPLACE INTO fx_rates(currency, date, rate)
+                                   VALUES (?, ?, ?)''',
+                                   ((row["currency"].strip().upper(), row["date"].strip(), float(row["rate"]))
+                                    for row in csv.DictReader(rates_file)))
+        cursor.execute('''SELECT COUNT(*), TOTAL(rate), MAX(date) FROM fx_rates''')
+        if cursor.fetchone() != rates_before:
+            rebuild_budget_window_totals(cursor)
+        save_setting(cursor, FX_RATE_FILES_SETTING, fingerprint)
+        db.commit()
+        fx_rate.cache_clear()
+    except (sqlite3.Error, KeyError, ValueError) as e:
+        print(f"\n~ The following error occurred while loading exchange rates: {e}. ~\n")
+        db.rollback()
+
+
+# SQL expression converting an amount column of a table into the reporting
+# currency, using the latest rate on or before the row's date (or the earliest
+# rate after it). Rows are converted inside the aggregate query itself, so
+# totals over mixed currencies still take a single pass.
+def converted_amount_sql(table, amount_column):
+    return convert_sql(f"{table}.{amount_column}", f"{table}.currency", f"{table}.date")
+
+
+# The same conversion for arbitrary amount, currency and date expressions.
+def convert_sql(amount, currency, date):
+    rate_lookup = f'''SELECT rate FROM fx_rates
+                      WHERE fx_rates.currency = {currency}'''
+    return f'''(CASE WHEN {currency} IS NULL OR {currency} = '{REPORTING_CURRENCY}'
+                THEN {amount}
+                ELSE {amount} * COALESCE(
+                    ({rate_lookup} AND fx_rates.date <= {date} ORDER BY fx_rates.date DESC LIMIT 1),
+                    ({rate_lookup} AND fx_rates.date > {date} ORDER BY fx_rates.date LIMIT 1))
+                END)'''
+
+
+# Rate for one unit of a currency on a given date, memoised per (currency, date).
+@functools.lru_cache(maxsize=4096)
+def fx_rate(currency, date):
+    if currency is None or currency == REPORTING_CURRENCY:
+        return 1.0
+    cursor, db = database_connect()
+    try:
+        return exchange_rate(cursor, currency, date)
+    finally:
+        db.close()
+
+
+def format_amount(amount, currency=REPORTING_CURRENCY):
+    if currency is None or currency == REPORTING_CURRENCY:
+        return f"£{amount}"
+    return f"{amount} {currency}"
+
+
+# Ask for a currency code, defaulting to the reporting currency.
+def input_currency(cursor):
+    while True:
+        currency = input(f"Please enter the currency code [{REPORTING_CURRENCY}]: ").strip().upper()
+        if not currency:
+            return REPORTING_CURRENCY
+        if currency == REPORTING_CURRENCY:
+            return currency
+        cursor.execute('''SELECT 1 FROM fx_rates WHERE currency = ? LIMIT 1''', (currency,))
+        if cursor.fetchone():
+            return currency
+        print(f"\n~ No exchange rates found for '{currency}'. Please try again. ~\n")
+
+
+# ------- Auto-categorisation -------
+# Rules match either a keyword (a word or phrase found in the description) or a
+# case-insensitive regular expression, optionally limited to an amount range.
+# Keywords are indexed by their first word, so a description is classified by
+# looking up each of its words once rather than testing every rule in turn.
+# Regular expression rules are combined into a single alternation, so they
+# cannot use backreferences, whose group numbers would shift once combined.
+UNCATEGORISED = "Uncategorised"
+RECATEGORISE_BATCH_SIZE = 10000
+WORD_PATTERN = re.compile(r"\w+")
+BACKREFERENCE_PATTERN = re.compile(r"(?<!\\)(?:\\\\)*(?:\\[1-9]|\(\?P=|\(\?\()")
+
+
+def get_category_rules(cursor, kind="expense"):
+    def load():
+        cursor.execute('''
+                       SELECT match_type, pattern, category, min_amount, max_amount
+                       FROM category_rules WHERE kind = ? ORDER BY id
+                       ''', (kind,))
+        keyword_index = {}
+        regex_rules = {}
+        for match_type, pattern, category, min_amount, max_amount in cursor.fetchall():
+            rule = (category, min_amount, max_amount)
+            if match_type == "regex":
+                regex_rules.setdefault(pattern, []).append(rule)
+                continue
+            phrase = tuple(WORD_PATTERN.findall(pattern.lower()))
+            if phrase:
+                phrases = keyword_index.setdefault(phrase[0], {})
+                phrases.setdefault(phrase, []).append(rule)
+        
+        # Longer phrases are tried first so 'tesco petrol' wins over 'tesco'.
+        keyword_index = {word: sorted(phrases.items(), key=lambda item: -len(item[0]))
+                         for word, phrases in keyword_index.items()}
+        
+        # Each distinct pattern gets its own named group so the rules behind a
+        # match can be found from match.lastgroup. The patterns are also kept
+        # separately, for re-testing when the matched rules do not apply.
+        regex = None
+        if regex_rules:
+            regex = re.compile("|".join(f"(?P<r{index}>{pattern})"
+                                        for index, pattern in enumerate(regex_rules)), re.IGNORECASE)
+        patterns = [re.compile(pattern, re.IGNORECASE) for pattern in regex_rules]
+        return keyword_index, regex, patterns, list(regex_rules.values())
+    return cache_lookup(("category_rules", kind), load)
+
+
+def first_matching_rule(rules, amount):
+    for category, min_amount, max_amount in rules:
+        if amount is not None:
+            if min_amount is not None and amount < min_amount:
+                continue
+            if max_amount is not None and amount > max_amount:
+                continue
+        return category
+    return None
+
+
+def categorise(compiled_rules, description, amount=None):
+    keyword_index, regex, patterns, regex_rules = compiled_rules
+    if not description:
+        return None
+    
+    if keyword_index:
+        words = WORD_PATTERN.findall(description.lower())
+        for position, word in enumerate(words):
+            for phrase, rules in keyword_index.get(word, ()):
+                if len(phrase) == 1 or tuple(words[position:position + len(phrase)]) == phrase:
+                    category = first_matching_rule(rules, amount)
+                    if category:
+                        return category
+    
+    # The alternation only reports the first pattern matching at a position.
+    # If none of its rules fit the amount, the later patterns are tried at the
+    # same position before the search moves on by one character.
+    if regex is not None:
+        position = 0
+        while position <= len(description):
+            match = regex.search(description, position)
+            if not match:
+                break
+            first = int(match.lastgroup[1:])
+            for index in range(first, len(patterns)):
+                if index == first or patterns[index].match(description, match.start()):
+                    category = first_matching_rule(regex_rules[index], amount)
+                    if category:
+                        return category
+            position = match.start() + 1
+    return None
+
+
+def add_category_rule(cursor, db, pattern, category, min_amount=None, max_amount=None,
+                      kind="expense", match_type="keyword", source="manual"):
+    if match_type == "regex":
+        re.compile(pattern)
+        if BACKREFERENCE_PATTERN.search(pattern):
+            raise re.error("backreferences cannot be used in categorisation rules", pattern)
+    cursor.execute('''
+                   INSERT INTO category_rules(kind, match_type, pattern, category, min_amount, max_amount, source)
+                   VALUES(?, ?, ?, ?, ?, ?, ?)''',
+                   (kind, match_type, pattern, category, min_amount, max_amount, source))
+    db.commit()
+    cache_invalidate(("category_rules", kind))
+
+
+# Learn merchant keyword rules from existing expenses. The first word of each
+# description is treated as the merchant, and becomes a rule when it has been
+# seen at least min_count times and nearly always with the same category.
+def learn_category_rules(min_count=2, min_share=0.8):
+    try:
+        cursor, db = database_connect()
+        cursor.execute('''
+                       SELECT description, expense_category FROM expense_tracker
+                       WHERE expense_category IS NOT NULL AND expense_category != ?
+                       ''', (UNCATEGORISED,))
+        merchant_categories = {}
+        for description, category in cursor:
+            words = (description or "").lower().split()
+            if words and len(words[0]) > 2:
+                merchant_categories.setdefault(words[0], Counter())[category] += 1
+        
+        learned = []
+        for merchant, categories in merchant_categories.items():
+            category, count = categories.most_common(1)[0]
+            if count >= min_count and count / sum(categories.values()) >= min_share:
+                learned.append((merchant, category))
+        
+        cursor.execute('''DELETE FROM category_rules WHERE kind = 'expense' AND source = 'learned' ''')
+        cursor.executemany('''
+                           INSERT INTO category_rules(kind, match_type, pattern, category, source)
+                           VALUES('expense', 'keyword', ?, ?, 'learned')''', learned)
+        db.commit()
+        cache_invalidate(("category_rules", "expense"))
+        return len(learned)
+    except sqlite3.Error as e:
+        print(f"\n~ The following error occurred: {e}. ~\n")
+        db.rollback()
+        return 0
+
+
+# Re-categorise expenses and income in id-ordered batches, committing after
+# each batch. Expenses use the expense rules and income the income rules. By
+# default only rows without a category are touched. Returns the number of
+# expenses and of income entries changed.
+RECATEGORISE_TABLES = (
+    ("expense", "expense_tracker", "expense_category", "expense_amount"),
+    ("income", "income_tracker", "income_category", "income_amount"),
+)
+
+
+def recategorise_transactions(only_uncategorised=True, batch_size=RECATEGORISE_BATCH_SIZE):
+    updated = {"expense": 0, "income": 0}
+    try:
+        cursor, db = database_connect()
+        for kind, table, category_column, amount_column in RECATEGORISE_TABLES:
+            compiled_rules = get_category_rules(cursor, kind)
+            condition = f"AND ({category_column} IS NULL OR {category_column} IN ('', ?))" if only_uncategorised else ""
+            last_id = 0
+            while True:
+                params = (last_id, UNCATEGORISED, batch_size) if only_uncategorised else (last_id, batch_size)
+                cursor.execute(f'''
+                               SELECT id, description, {amount_column}, {category_column}
+                               FROM {table} WHERE id > ? {condition}
+                               ORDER BY id LIMIT ?
+                               ''', params)
+                batch = cursor.fetchall()
+                if not batch:
+                    break
+                last_id = batch[-1][0]
+                
+                changes = []
+                for row_id, description, amount, current_category in batch:
+                    category = categorise(compiled_rules, description, amount)
+                    if category and category != current_category:
+                        changes.append((category, row_id))
+                cursor.executemany(f'''UPDATE {table} SET {category_column} = ? WHERE id = ?''', changes)
+                db.commit()
+                updated[kind] += len(changes)
+        cache_invalidate("expense_categories", "income_categories")
+    except sqlite3.Error as e:
+        print(f"\n~ The following error occurred: {e}. ~\n")
+        db.rollback()
+    return updated["expense"], updated["income"]
+
+
+# ------- Manage categorisation rules -------
+def manage_category_rules():
+    try:
+        cursor, db = database_connect()
+        print("\n****** Auto-categorisation ******\n")
+        print("1. Add a categorisation rule")
+        print("2. Learn rules from existing expenses")
+        print("3. Re-categorise uncategorised expenses and income")
+        print("4. Re-categorise all expenses and income")
+        print("0. Return\n")
+        try:
+            rule_option = int(input("Which of previous options would you like to carry-out (0-4): "))
+            if rule_option == 1:
+                kind = "income" if input("Is this rule for expenses or income (E or I): ").title() == "I" else "expense"
+                match_type = "regex" if input("Match a keyword or a regular expression (K or R): ").title() == "R" else "keyword"
+                keyword = input("Please enter the keyword or pattern found in the description: ").strip()
+                category = input("Please enter the category it should be given: ").title()
+                min_amount = input("Please enter a minimum amount (leave blank for none): ").strip()
+                max_amount = input("Please enter a maximum amount (leave blank for none): ").strip()
+                add_category_rule(cursor, db, keyword, category,
+                                  float(min_amount) if min_amount else None,
+                                  float(max_amount) if max_amount else None, kind, match_type)
+                print(f"\nSuccess! Descriptions matching '{keyword}' will be categorised as '{category}'.\n")
+            elif rule_option == 2:
+                print(f"\nSuccess! {learn_category_rules()} rules have been learned from existing expenses.\n")
+            elif rule_option in (3, 4):
+                # There is no record of which categories were entered by hand,
+                # so replacing them all is confirmed first.
+                if rule_option == 4:
+                    print("\nThis will replace every category a rule matches, including ones you entered yourself.")
+                    if input("Would you still like to re-categorise all expenses and income (Y or N): ").title() != "Y":
+                        print("\nNo categories have been changed.\n")
+                        return
+                expenses, income = recategorise_transactions(only_uncategorised=rule_option == 3)
+                print(f"\nSuccess! {expenses} expenses and {income} income entries have been re-categorised.\n")
+            elif rule_option != 0:
+                print("\n~ Oops - incorrect input. Please try again. ~\n")
+        except re.error as e:
+            print(f"\n~ Invalid pattern: {e}. ~\n")
+        except ValueError:
+            print("\n~ Invalid input. Please enter a relevant number. ~\n")
+    except sqlite3.Error as e:
+        print(f"\n~ The following error occurred: {e}. ~\n")
+        db.rollback()
+
+
+# ------- Duplicate and unusual expenses -------
+# Duplicates are expenses with the same description, amount and currency
+# recorded within DUPLICATE_WINDOW_DAYS of each other. Outliers are category
+# months whose total spend is more than OUTLIER_Z_SCORE standard deviations
+# above the category's history: the months with spending among the previous
+# OUTLIER_HISTORY_MONTHS calendar months. The deviation is never taken as less
+# than OUTLIER_MIN_DEVIATION of the mean, so steady spending such as rent is
+# not flagged for changing by a few pence.
+DUPLICATE_WINDOW_DAYS = 3
+OUTLIER_HISTORY_MONTHS = 6
+OUTLIER_MIN_HISTORY = 3
+OUTLIER_Z_SCORE = 3.0
+OUTLIER_MIN_DEVIATION = 0.1
+
+
+# Each expense is compared only with the previous matching one in date order,
+# so the whole ledger is checked with one sorted pass.
+def find_duplicate_expenses(cursor, window_days=DUPLICATE_WINDOW_DAYS):
+    cursor.execute('''
+                   SELECT id, date, description, expense_amount, currency, previous_id, previous_date
+                   FROM (SELECT id, date, description, expense_amount, currency,
+                         LAG(id) OVER matching AS previous_id,
+                         LAG(date) OVER matching AS previous_date
+                         FROM expense_tracker
+                         WINDOW matching AS (PARTITION BY LOWER(description), expense_amount, currency
+                                             ORDER BY date, id))
+                   WHERE previous_date IS NOT NULL
+                   AND julianday(date) - julianday(previous_date) <= ?
+                   ORDER BY date, id
+                   ''', (window_days,))
+    return stream_rows(cursor)
+
+
+def z_score(value, history):
+    mean = statistics.fmean(history)
+    deviation = max(statistics.pstdev(history, mean), OUTLIER_MIN_DEVIATION * abs(mean))
+    if deviation == 0:
+        return float("inf") if value > mean else 0.0
+    return (value - mean) / deviation
+
+
+# Months counted from year 0, so calendar months can be compared by subtraction.
+def month_number(month):
+    return int(month[:4]) * 12 + int(month[5:7]) - 1
+
+
+# Monthly totals arrive sorted by category and month, and a rolling window of
+# the previous months is kept per category as the pass moves along.
+def find_outlier_months(cursor, history_months=OUTLIER_HISTORY_MONTHS, threshold=OUTLIER_Z_SCORE):
+    cursor.execute('''
+                   SELECT expense_category, strftime('%Y-%m', date) AS month,
+                   SUM(''' + converted_amount_sql("expense_lines", "amount") + ''')
+                   FROM expense_lines
+                   GROUP BY expense_category, month
+                   ORDER BY expense_category, month
+                   ''')
+    outliers = []
+    current_category = None
+    history = deque()
+    for category, month, total in cursor:
+        if category != current_category:
+            current_category = category
+            history.clear()
+        total = total or 0
+        while history and history[0][0] < month_number(month) - history_months:
+            history.popleft()
+        if len(history) >= OUTLIER_MIN_HISTORY:
+            totals = [history_total for _, history_total in history]
+            score = z_score(total, totals)
+            if score > threshold:
+                outliers.append((category, month, total, statistics.fmean(totals), score))
+        history.append((month_number(month), total))
+    return outliers
+
+
+# Check a single expense before it is inserted, using the indexes on
+# (expense_amount, date) and (expense_category, date).
+def check_new_expense(cursor, date, description, category, amount, currency=REPORTING_CURRENCY):
+    warnings = []
+    cursor.execute(f'''
+                   SELECT id, date FROM expense_tracker
+                   WHERE expense_amount = ?
+                   AND date BETWEEN date(?, '-{DUPLICATE_WINDOW_DAYS} days') AND date(?, '+{DUPLICATE_WINDOW_DAYS} days')
+                   AND LOWER(description) = LOWER(?) AND currency = ?
+                   ''', (amount, date, date, description, currency))
+    for duplicate_id, duplicate_date in cursor.fetchall():
+        warnings.append(f"Possible duplicate of expense {duplicate_id} on {duplicate_date}.")
+    
+    cursor.execute(f'''
+                   SELECT strftime('%Y-%m', date) AS month,
+                   SUM(''' + converted_amount_sql("expense_lines", "amount") + f''')
+                   FROM expense_lines
+                   WHERE expense_category = ?
+                   AND date >= date(?, 'start of month', '-{OUTLIER_HISTORY_MONTHS} months')
+                   AND date < date(?, 'start of month', '+1 month')
+                   GROUP BY month
+                   ''', (category, date, date))
+    monthly_totals = dict(cursor.fetchall())
+    month = date[:7]
+    month_total = (monthly_totals.pop(month, 0) or 0) + amount * fx_rate(currency, date)
+    history = [total or 0 for total in monthly_totals.values()]
+    if len(history) >= OUTLIER_MIN_HISTORY and z_score(month_total, history) > OUTLIER_Z_SCORE:
+        warnings.append(f"This would bring '{category}' spending for {month} to £{round(month_total, 2)}, "
+                        f"well above the usual £{round(statistics.fmean(history), 2)} per month.")
+    return warnings
+
+
+# ------- View duplicate and unusual expenses -------
+def view_anomalies():
+    try:
+        cursor, db = database_connect()
+        print("\n****** Possible Duplicate Expenses ******\n")
+        duplicates = 0
+        for expense_id, date, description, amount, currency, previous_id, previous_date in find_duplicate_expenses(cursor):
+            print(f"{expense_id}: '{description}' on {date} for {format_amount(amount, currency)} "
+                  f"matches {previous_id} on {previous_date}.")
+            duplicates += 1
+        if not duplicates:
+            print("No possible duplicates found.")
+        
+        print("\n****** Unusual Monthly Spending ******\n")
+        outliers = find_outlier_months(cursor)
+        for category, month, total, usual, score in outliers:
+            print(f"{category} in {month}: £{round(total, 2)} against a usual £{round(usual, 2)} per month.")
+        if not outliers:
+            print("No unusual spending found.")
+        print("______________________________________________________________________\n")
+    except sqlite3.Error as e:
+        print(f"\n~ The following error occurred: {e}. ~\n")
+        db.rollback()
+
+
 # ------- Entering a new expense -------
+# The menu and the command line record expenses in two steps, so the menu can
+# ask whether to go ahead when there are warnings. prepare_expense fills in a
+# blank category and checks for duplicates and unusual spending, and
+# save_expense writes the expense and raises any budget alerts.
+def prepare_expense(cursor, date, description, category, amount, currency=REPORTING_CURRENCY):
+    description = description.capitalize()
+    category = (category or "").title()
+    if not category:
+        category = categorise(get_category_rules(cursor, "expense"), description, amount) or UNCATEGORISED
+    return description, category, check_new_expense(cursor, date, description, category, amount, currency)
+
+
+def save_expense(cursor, db, date, description, category, amount, currency=REPORTING_CURRENCY):
+    cursor.execute(EXPENSE_INSERT_SQL, (date, description, category, amount, currency))
+    db.commit()
+    expense_id = cursor.lastrowid
+    cache_invalidate("expense_categories")
+    return expense_id, check_budget_alerts(cursor, db, category, date)
+
+
 def add_expense():
     try:
         cursor, db = database_connect()
-        cursor.execute('''SELECT MAX(id) FROM expense_tracker
-                       ''')
-        max_id = cursor.fetchone()[0] or 0
-        new_expense_id = max_id + 1
-        
         while True:
             new_expense_date = input("\nPlease enter the date of the expense [yyyy-mm-dd]: ")
             try:
@@ -221,23 +1322,29 @@ def add_expense():
             except ValueError:
                 print("\n~ Invalid date format. Please try again. ~\n")
 
-        new_expense_description = input("Please enter a short description of the expense: ").capitalize()
-        new_expense_category = input("Please enter the expense category: ").title()
-        new_expense_amount = float(input("Please enter the expense amount in GBP (£): "))
+        new_expense_description = input("Please enter a short description of the expense: ")
+        new_expense_category = input("Please enter the expense category (leave blank to auto-categorise): ")
+        new_expense_currency = input_currency(cursor)
+        new_expense_amount = float(input(f"Please enter the expense amount in {new_expense_currency}: "))
+        new_expense_description, new_expense_category, expense_warnings = prepare_expense(
+            cursor, new_expense_date, new_expense_description, new_expense_category,
+            new_expense_amount, new_expense_currency)
+        if expense_warnings:
+            print()
+            for warning in expense_warnings:
+                print(f"~ {warning} ~")
+            if input("Would you still like to save this expense (Y or N): ").title() != "Y":
+                print("\nExpense not saved.\n")
+                return
         
-        cursor.execute('''
-                       INSERT INTO expense_tracker
-                       (id, date, description, expense_category, expense_amount)
-                       VALUES (?, ?, ?, ?, ?)''',
-                       (new_expense_id, new_expense_date, new_expense_description,
-                        new_expense_category, new_expense_amount))
-        db.commit()
+        new_expense_id, _ = save_expense(cursor, db, new_expense_date, new_expense_description,
+                                         new_expense_category, new_expense_amount, new_expense_currency)
         print(f"\nSuccess! The following has been entered into the database:")
         print(f"id:                     {new_expense_id}")
         print(f"Expense Date:           {new_expense_date}")
         print(f"Expense:                {new_expense_description}")
         print(f"Expense Category:       {new_expense_category}")
-        print(f"Expense Amount:         £{new_expense_amount}")
+        print(f"Expense Amount:         {format_amount(new_expense_amount, new_expense_currency)}")
         print("______________________________________________________________________\n")
 
     except sqlite3.Error as e:
@@ -245,6 +1352,70 @@ def add_expense():
         db.rollback()
 
 
+# ------- Splits and tags -------
+def add_expense_split(cursor, db, expense_id, category, amount):
+    cursor.execute('''
+                   INSERT INTO expense_splits(expense_id, expense_category, amount)
+                   VALUES(?, ?, ?)''', (expense_id, category, amount))
+    db.commit()
+    cache_invalidate("expense_categories")
+
+
+def tag_expense(cursor, db, expense_id, tag_names):
+    cursor.executemany('''INSERT OR IGNORE INTO tags(name) VALUES(?)''', [(tag,) for tag in tag_names])
+    cursor.executemany('''
+                       INSERT OR IGNORE INTO expense_tags(tag_id, expense_id)
+                       SELECT id, ? FROM tags WHERE name = ?''',
+                       [(expense_id, tag) for tag in tag_names])
+    db.commit()
+
+
+# Expenses carrying a tag, read through the (tag_id, expense_id) primary key.
+def find_expenses_by_tag(cursor, tag):
+    cursor.execute('''
+                   SELECT expense_tracker.id, expense_tracker.date, expense_tracker.description,
+                   expense_tracker.expense_category, expense_tracker.expense_amount, expense_tracker.currency
+                   FROM tags
+                   JOIN expense_tags ON expense_tags.tag_id = tags.id
+                   JOIN expense_tracker ON expense_tracker.id = expense_tags.expense_id
+                   WHERE tags.name = ?
+                   ORDER BY expense_tags.expense_id
+                   ''', (tag.lower(),))
+    return stream_rows(cursor, ExpenseRecord)
+
+
+def tag_total(cursor, tag):
+    cursor.execute('''
+                   SELECT COUNT(*), TOTAL(''' + converted_amount_sql("expense_tracker", "expense_amount") + ''')
+                   FROM tags
+                   JOIN expense_tags ON expense_tags.tag_id = tags.id
+                   JOIN expense_tracker ON expense_tracker.id = expense_tags.expense_id
+                   WHERE tags.name = ?
+                   ''', (tag.lower(),))
+    return cursor.fetchone()
+
+
+# ------- Viewing expenses by tag -------
+def view_tag_expenses():
+    try:
+        cursor, db = database_connect()
+        cursor.execute('''SELECT name FROM tags ORDER BY name''')
+        print("\n****** Current Tags ******")
+        for tag in stream_rows(cursor):
+            print(f"- {tag[0]}")
+        chosen_tag = input("\nPlease select which tag you'd like to display: ").strip().lower()
+        print(f"\nSuccess! Please find expenses tagged '{chosen_tag}' below:\n")
+        for expense in find_expenses_by_tag(cursor, chosen_tag):
+            print(f"{expense.id}: '{expense.description}' ({expense.expense_category}) on {expense.date} "
+                  f"for {format_amount(expense.expense_amount, expense.currency)}.")
+        count, total = tag_total(cursor, chosen_tag)
+        print(f"\nTotal for {count} expenses:    £{round(total, 2)}")
+        print("______________________________________________________________________\n")
+    except sqlite3.Error as e:
+        print(f"\n~ The following error occurred: {e}. ~\n")
+        db.rollback()
+
+
 # ------- Viewing all expenses -------
 def view_expenses():
     try:
@@ -254,7 +1425,7 @@ def view_expenses():
                        SELECT * FROM expense_tracker
                        ''')
         for row in cursor:
-            print(f"{row[0]}: '{row[2]}' ({row[3]}) on {row[1]} for £{row[4]}.")
+            print(f"{row[0]}: '{row[2]}' ({row[3]}) on {row[1]} for {format_amount(row[4], row[5])}.")
             print("______________________________________________________________________\n")
         while True:
             try:
@@ -265,15 +1436,17 @@ def view_expenses():
                                    SELECT * FROM expense_tracker WHERE id = ?
                                    ''', (chosen_id,))
                     chosen_expense = cursor.fetchone()
-                    print(f"\n{chosen_expense[0]}: '{chosen_expense[2]}' ({chosen_expense[3]}) on {chosen_expense[1]} for £{chosen_expense[4]}.\n")
+                    print(f"\n{chosen_expense[0]}: '{chosen_expense[2]}' ({chosen_expense[3]}) on {chosen_expense[1]} for {format_amount(chosen_expense[4], chosen_expense[5])}.\n")
                     print("Options:")
                     print("1. Update expense date")
                     print("2. Update expense description")
                     print("3. Update expense category")
                     print("4. Update expense amount")
                     print("5. Delete expense")
+                    print("6. Split expense across categories")
+                    print("7. Add tags to expense")
                     print("0. Return\n")
-                    update_expense_option = int(input("Which of previous options would you like to carry-out (0-5): "))
+                    update_expense_option = int(input("Which of previous options would you like to carry-out (0-7): "))
                 
                 
                     # ------- Update expense date -------
@@ -290,6 +1463,12 @@ def view_expenses():
                             cursor.execute('''UPDATE expense_tracker SET date = ? WHERE id = ?
                                            ''', (update_expense_date, chosen_id))
                             db.commit()
+                            # Split lines move to the new date too, so every
+                            # category the expense is spread over is checked.
+                            cursor.execute('''SELECT DISTINCT expense_category FROM expense_lines WHERE expense_id = ?
+                                           ''', (chosen_id,))
+                            for line_category, in cursor.fetchall():
+                                check_budget_alerts(cursor, db, line_category, update_expense_date)
                             print(f"\nSuccess! {chosen_id}'s expense has been updated to {update_expense_date}.\n")
                         except sqlite3.Error as e:
                             print(f"\n~ The following error occurred: {e}. ~\n")
@@ -312,10 +1491,12 @@ def view_expenses():
                     # ------- Update expense category -------
                     elif update_expense_option == 3:
                         try:
-                            update_expense_cat = input("\nPlease enter the new category for the chosen expense: ")
+                            update_expense_cat = input("\nPlease enter the new category for the chosen expense: ").title()
                             cursor.execute('''UPDATE expense_tracker SET expense_category = ? WHERE id = ?
                                            ''', (update_expense_cat, chosen_id))
                             db.commit()
+                            cache_invalidate("expense_categories")
+                            check_budget_alerts(cursor, db, update_expense_cat, chosen_expense[1])
                             print(f"\nSuccess! {chosen_id}'s expense category has been updated to {update_expense_cat}.\n")
                         except sqlite3.Error as e:
                             print(f"\n~ The following error occurred: {e}. ~\n")
@@ -326,10 +1507,17 @@ def view_expenses():
                     elif update_expense_option == 4:
                         try:
                             update_expense_amt = float(input("\nPlease enter the new amount for the chosen expense: "))
-                            cursor.execute('''UPDATE expense_tracker SET expense_amount = ? WHERE id = ?
-                                           ''', (update_expense_amt, chosen_id))
-                            db.commit()
-                            print(f"\nSuccess! {chosen_id}'s expense amount has been updated to £{update_expense_amt}.\n")
+                            cursor.execute('''SELECT split_amount FROM expense_tracker WHERE id = ?''', (chosen_id,))
+                            split_total = cursor.fetchone()[0]
+                            if update_expense_amt < split_total:
+                                print(f"\n~ {format_amount(split_total, chosen_expense[5])} of this expense is split into other "
+                                      f"categories, so the amount cannot be lower than that. ~\n")
+                            else:
+                                cursor.execute('''UPDATE expense_tracker SET expense_amount = ? WHERE id = ?
+                                               ''', (update_expense_amt, chosen_id))
+                                db.commit()
+                                check_budget_alerts(cursor, db, chosen_expense[3], chosen_expense[1])
+                                print(f"\nSuccess! {chosen_id}'s expense amount has been updated to {format_amount(update_expense_amt, chosen_expense[5])}.\n")
                         except sqlite3.Error as e:
                             print(f"\n~ The following error occurred: {e}. ~\n")
                             db.rollback()
@@ -342,6 +1530,7 @@ def view_expenses():
                             if delete_expense_check == "Y":
                                 cursor.execute('''DELETE FROM expense_tracker where id = ?''', (chosen_id,))
                                 db.commit()
+                                cache_invalidate("expense_categories")
                                 print(f"\nSuccess! {chosen_id} has been deleted from database.\n")
                             elif delete_expense_check == "N":
                                 break
@@ -351,6 +1540,40 @@ def view_expenses():
                             print(f"\n~ The following error occurred: {e}. ~\n")
                             db.rollback()
 
+
+                    # ------- Split expense -------
+                    elif update_expense_option == 6:
+                        try:
+                            cursor.execute('''SELECT expense_category, amount FROM expense_splits WHERE expense_id = ?''', (chosen_id,))
+                            for split_category, split_amount in cursor.fetchall():
+                                print(f"- {split_category}: {format_amount(split_amount, chosen_expense[5])}")
+                            cursor.execute('''SELECT expense_amount - split_amount FROM expense_tracker WHERE id = ?''', (chosen_id,))
+                            unsplit_amount = cursor.fetchone()[0]
+                            print(f"\n{format_amount(unsplit_amount, chosen_expense[5])} is still under '{chosen_expense[3]}'.")
+                            split_category = input("\nPlease enter the category for part of this expense: ").title()
+                            split_amount = float(input("Please enter the amount for that category: "))
+                            if 0 < split_amount <= unsplit_amount:
+                                add_expense_split(cursor, db, chosen_id, split_category, split_amount)
+                                check_budget_alerts(cursor, db, split_category, chosen_expense[1])
+                                print(f"\nSuccess! {format_amount(split_amount, chosen_expense[5])} of {chosen_id} is now under '{split_category}'.\n")
+                            else:
+                                print(f"\n~ The split amount must be between 0 and {unsplit_amount}. ~\n")
+                        except sqlite3.Error as e:
+                            print(f"\n~ The following error occurred: {e}. ~\n")
+                            db.rollback()
+
+
+                    # ------- Tag expense -------
+                    elif update_expense_option == 7:
+                        try:
+                            tag_names = input("\nPlease enter tags for the chosen expense, separated by commas: ")
+                            tag_names = [tag.strip().lower() for tag in tag_names.split(",") if tag.strip()]
+                            tag_expense(cursor, db, chosen_id, tag_names)
+                            print(f"\nSuccess! {chosen_id} has been tagged with {', '.join(tag_names)}.\n")
+                        except sqlite3.Error as e:
+                            print(f"\n~ The following error occurred: {e}. ~\n")
+                            db.rollback()
+
                 
                     # ----- Return to previous option menu -----
                     elif update_expense_option == 0:
@@ -381,24 +1604,21 @@ def view_category_expenses():
     try:
         cursor, db = database_connect()
         print("\n****** Current Expense Categories ******")
-        cursor.execute('''
-                       SELECT DISTINCT expense_category FROM expense_tracker
-                       ''')
-        category_list = cursor.fetchall()
+        category_list = get_expense_categories(cursor)
         for category in category_list:
-            print(f"- {category[0]}")
+            print(f"- {category}")
         chosen_category = input("\nPlease select which category you'd like to display: ").title()
         cursor.execute('''
-                       SELECT * FROM expense_tracker WHERE expense_category = ?
+                       SELECT id, date, description, expense_category, expense_amount, currency
+                       FROM expense_tracker WHERE expense_category = ?
                        ''', (chosen_category,))
-        chosen_expenses = cursor.fetchall()
         print(f"\nSuccess! Please find expenses for '{chosen_category}' below:\n")
-        for expense in chosen_expenses:
-            print(f"id:                     {expense[0]}")
-            print(f"Expense Date:           {expense[1]}")
-            print(f"Expense:                {expense[2]}")
-            print(f"Expense Category:       {expense[3]}")
-            print(f"Expense Amount:         £{expense[4]}")
+        for expense in stream_rows(cursor, ExpenseRecord):
+            print(f"id:                     {expense.id}")
+            print(f"Expense Date:           {expense.date}")
+            print(f"Expense:                {expense.description}")
+            print(f"Expense Category:       {expense.expense_category}")
+            print(f"Expense Amount:         {format_amount(expense.expense_amount, expense.currency)}")
             print("______________________________________________________________________\n")
         
         
@@ -409,7 +1629,12 @@ def view_category_expenses():
             cursor.execute('''UPDATE expense_tracker SET expense_category = ?
                            WHERE expense_category = ?
                            ''', (new_category, chosen_category))
+            cursor.execute('''UPDATE expense_splits SET expense_category = ?
+                           WHERE expense_category = ?
+                           ''', (new_category, chosen_category))
             db.commit()
+            cache_invalidate("expense_categories")
+            check_budget_alerts(cursor, db, new_category, datetime.date.today().isoformat())
             print(f"\nSuccessfully updated the category '{chosen_category}' to '{new_category}'.\n")
         elif update_category == "N":
             print("\nCategory not updated.\n")
@@ -421,21 +1646,24 @@ def view_category_expenses():
 
 
 # ------- Entering a new income -------
+# Save a new income, auto-categorising it when the category is blank. Shared
+# by the menu and the command line. Returns the new id and the description and
+# category as saved.
+def save_income(cursor, db, date, description, category, amount, currency=REPORTING_CURRENCY):
+    description = description.title()
+    category = (category or "").title()
+    if not category:
+        category = categorise(get_category_rules(cursor, "income"), description, amount) or UNCATEGORISED
+    cursor.execute(INCOME_INSERT_SQL, (date, description, category, amount, currency))
+    db.commit()
+    cache_invalidate("income_categories")
+    return cursor.lastrowid, description, category
+
+
 def add_income():
     try:
         cursor, db = database_connect()
 
-        """
-        Create new id for income based on the largest id value in database.
-        If not id values exist, it starts at 1.
-        """
-
-        cursor.execute('''SELECT MAX(id) FROM income_tracker
-                       ''')
-        max_id = cursor.fetchone()[0] or 0
-        new_income_id = max_id + 1
-
-
         # Ask user to input income date and validate it.
         while True:
             new_income_date = input("\nPlease enter the date of the income [yyyy-mm-dd]: ")
@@ -447,22 +1675,19 @@ def add_income():
         
         
         new_income_description = input("Please enter a short description of the income: ").title()
-        new_income_category = input("Please enter the income category: ").title()
+        new_income_category = input("Please enter the income category (leave blank to auto-categorise): ")
+        new_income_currency = input_currency(cursor)
         try:
-            new_income_amount = float(input("Please enter the income amount in GBP (£): "))
-            cursor.execute('''
-                           INSERT INTO income_tracker(
-                           id, date, description, income_category, income_amount)
-                           VALUES(?, ?, ?, ?, ?)''',
-                           (new_income_id, new_income_date, new_income_description,
-                            new_income_category, new_income_amount))
-            db.commit()
+            new_income_amount = float(input(f"Please enter the income amount in {new_income_currency}: "))
+            new_income_id, new_income_description, new_income_category = save_income(
+                cursor, db, new_income_date, new_income_description, new_income_category,
+                new_income_amount, new_income_currency)
             print(f"\nSuccess! The following has been entered into the database:")
             print(f"id:                     {new_income_id}")
             print(f"Income Date:            {new_income_date}")
             print(f"Income:                 {new_income_description}")
             print(f"Income Category:        {new_income_category}")
-            print(f"Income Amount:          £{new_income_amount}")
+            print(f"Income Amount:          {format_amount(new_income_amount, new_income_currency)}")
             print("______________________________________________________________________\n")
         except ValueError:
             print("\n~ Error: Invalid input. Please enter a valid amount.\n ~")
@@ -482,7 +1707,7 @@ def view_income():
                        SELECT * FROM income_tracker
                        ''')
         for row in cursor:
-            print(f"{row[0]}: '{row[2]}'({row[3]}) on {row[1]} for £{row[4]}.")
+            print(f"{row[0]}: '{row[2]}'({row[3]}) on {row[1]} for {format_amount(row[4], row[5])}.")
             print("______________________________________________________________________\n")
         while True:
             try:
@@ -493,7 +1718,7 @@ def view_income():
                                    SELECT * FROM income_tracker WHERE id = ?
                                    ''', (chosen_id,))
                     chosen_income = cursor.fetchone()
-                    print(f"\n{chosen_income[0]}: '{chosen_income[2]}' ({chosen_income[3]}) on {chosen_income[1]} for £{chosen_income[4]}.\n")
+                    print(f"\n{chosen_income[0]}: '{chosen_income[2]}' ({chosen_income[3]}) on {chosen_income[1]} for {format_amount(chosen_income[4], chosen_income[5])}.\n")
                     print("\nOptions:")
                     print("1. Update income date")
                     print("2. Update income description")
@@ -540,10 +1765,11 @@ def view_income():
                     # ------- Update income category -------
                     elif update_income_option == 3:
                         try:
-                            update_income_cat = input("\nPlease enter the new category for the chosen income: ")
+                            update_income_cat = input("\nPlease enter the new category for the chosen income: ").title()
                             cursor.execute('''UPDATE income_tracker SET income_category = ? WHERE id = ?
                                            ''', (update_income_cat, chosen_id))
                             db.commit()
+                            cache_invalidate("income_categories")
                             print(f"\nSuccess! {chosen_id}'s income category has been updated to {update_income_cat}.\n")
                         except sqlite3.Error as e:
                             print(f"\n~ The following error occurred: {e}. ~\n")
@@ -557,7 +1783,7 @@ def view_income():
                             cursor.execute('''UPDATE income_tracker SET income_amount = ? WHERE id = ?
                                            ''', (update_income_amt, chosen_id))
                             db.commit()
-                            print(f"\nSuccess! {chosen_id}'s income amount has been updated to {update_income_amt}.\n")
+                            print(f"\nSuccess! {chosen_id}'s income amount has been updated to {format_amount(update_income_amt, chosen_income[5])}.\n")
                         except sqlite3.Error as e:
                             print(f"\n~ The following error occurred: {e}. ~\n")
                             db.rollback()
@@ -570,6 +1796,7 @@ def view_income():
                             if delete_income_check == "Y":
                                 cursor.execute('''DELETE FROM income_tracker where id = ?''', (chosen_id,))
                                 db.commit()
+                                cache_invalidate("income_categories")
                                 print(f"\nSuccess! {chosen_id} has been deleted from database.\n")
                             elif delete_income_check == "N":
                                 break
@@ -609,24 +1836,21 @@ def view_category_income():
     try:
         cursor, db = database_connect()
         print("\n****** Current Income Categories ******")
-        cursor.execute('''
-                       SELECT DISTINCT income_category FROM income_tracker
-                       ''')
-        category_list = cursor.fetchall()
+        category_list = get_income_categories(cursor)
         for category in category_list:
-            print(f"- {category[0]}")
+            print(f"- {category}")
         chosen_category = input("\nPlease select which category you'd like to display: ").title()
         cursor.execute('''
-                       SELECT * FROM income_tracker WHERE income_category = ?
+                       SELECT id, date, description, income_category, income_amount, currency
+                       FROM income_tracker WHERE income_category = ?
                        ''', (chosen_category,))
-        chosen_income = cursor.fetchall()
         print(f"\nSuccess! Please find income for '{chosen_category}' below:\n")
-        for income in chosen_income:
-            print(f"id:                     {income[0]}")
-            print(f"Expense Date:           {income[1]}")
-            print(f"Expense:                {income[2]}")
-            print(f"Expense Category:       {income[3]}")
-            print(f"Expense Amount:         £{income[4]}")
+        for income in stream_rows(cursor, IncomeRecord):
+            print(f"id:                     {income.id}")
+            print(f"Expense Date:           {income.date}")
+            print(f"Expense:                {income.description}")
+            print(f"Expense Category:       {income.income_category}")
+            print(f"Expense Amount:         {format_amount(income.income_amount, income.currency)}")
             print("______________________________________________________________________\n")
 
 
@@ -638,6 +1862,7 @@ def view_category_income():
                            WHERE income_category = ?
                            ''', (new_category, chosen_category))
             db.commit()
+            cache_invalidate("income_categories")
             print(f"\nSuccessfully updated the category '{chosen_category}' to '{new_category}'.\n")
         elif update_category == "N":
             print("\nCategory not updated.\n")
@@ -654,7 +1879,8 @@ def total_expenses():
     try:
         cursor, db = database_connect()
         cursor.execute('''
-                       SELECT SUM(expense_amount) FROM expense_tracker
+                       SELECT TOTAL(''' + converted_amount_sql("expense_tracker", "expense_amount") + ''')
+                       FROM expense_tracker
                        ''')
         total_expenses = cursor.fetchone()[0]
         return total_expenses
@@ -668,7 +1894,8 @@ def total_income():
     try:
         cursor, db = database_connect()
         cursor.execute('''
-                       SELECT SUM(income_amount) FROM income_tracker
+                       SELECT TOTAL(''' + converted_amount_sql("income_tracker", "income_amount") + ''')
+                       FROM income_tracker
                        ''')
         total_income = cursor.fetchone()[0]
         return total_income
@@ -691,42 +1918,198 @@ def total_net_income():
         print(f"\n~ The following error occurred: {e}. ~\n")
 
 
+# ------- Budget windows and alerts -------
+# Spending is kept as running totals per category for each day, week, month
+# and quarter. Triggers on expense_tracker add or subtract the converted amount
+# of every row that is inserted, edited or deleted, so checking a budget is a
+# primary key lookup (or at most 30 daily rows for a rolling budget) instead of
+# re-summing expense_tracker. The periods, window keys and window_spend live
+# in tracker_lookups.py, so the command line can check budgets without loading
+# this file.
+ALERT_THRESHOLDS = (0.8, 1.0)
+
+
+# Statements adding (sign "") or removing (sign "-") amounts from the running
+# totals, one per granularity. Totals are keyed by the lower-case category, so
+# 'food' and 'Food' expenses count towards the same budget. Each line is a SELECT yielding category, amount,
+# currency and date, so the same statements serve single rows and split lines.
+# Lines that cannot be converted are left out, as they are from every other
+# total, so a window total is never NULL.
+def window_total_upserts(line_select, sign):
+    return "\n".join(f'''
+                     INSERT INTO budget_window_totals(expense_category, granularity, window_key, total)
+                     SELECT LOWER(category), '{granularity}', {key.format(date="date")}, {sign}amount
+                     FROM (SELECT line.category AS category, line.date AS date,
+                           {convert_sql("line.amount", "line.currency", "line.date")} AS amount
+                           FROM ({line_select}) AS line)
+                     WHERE amount IS NOT NULL
+                     ON CONFLICT (expense_category, granularity, window_key)
+                     DO UPDATE SET total = COALESCE(total, 0) + COALESCE(excluded.total, 0);'''
+                     for granularity, key in WINDOW_KEYS.items())
+
+
+# The lines an expense row contributes: its unsplit remainder under its own
+# category, plus each of its split lines.
+def expense_row_lines(row):
+    return f'''SELECT {row}.expense_category AS category,
+               {row}.expense_amount - {row}.split_amount AS amount,
+               {row}.currency AS currency, {row}.date AS date
+               UNION ALL
+               SELECT expense_splits.expense_category, expense_splits.amount, {row}.currency, {row}.date
+               FROM expense_splits WHERE expense_splits.expense_id = {row}.id'''
+
+
+# Adding a split moves its amount from the parent expense's category to the
+# split's category, in the parent's currency and on the parent's date.
+def split_row_lines(row, sign):
+    return f'''SELECT {row}.expense_category AS category, {sign}{row}.amount AS amount,
+               expense_tracker.currency AS currency, expense_tracker.date AS date
+               FROM expense_tracker WHERE expense_tracker.id = {row}.expense_id
+               UNION ALL
+               SELECT expense_tracker.expense_category, -({sign}{row}.amount),
+               expense_tracker.currency, expense_tracker.date
+               FROM expense_tracker WHERE expense_tracker.id = {row}.expense_id'''
+
+
+def budget_window_triggers():
+    return [
+        '''DROP TRIGGER IF EXISTS expense_window_insert''',
+        '''DROP TRIGGER IF EXISTS expense_window_update''',
+        '''DROP TRIGGER IF EXISTS expense_window_delete''',
+        '''DROP TRIGGER IF EXISTS split_window_insert''',
+        '''DROP TRIGGER IF EXISTS split_window_update''',
+        '''DROP TRIGGER IF EXISTS split_window_delete''',
+        f'''CREATE TRIGGER expense_window_insert AFTER INSERT ON expense_tracker
+            BEGIN {window_total_upserts(expense_row_lines("NEW"), "")}
+            END''',
+        f'''CREATE TRIGGER expense_window_update
+            AFTER UPDATE OF date, expense_category, expense_amount, currency ON expense_tracker
+            BEGIN {window_total_upserts(expense_row_lines("OLD"), "-")}
+            {window_total_upserts(expense_row_lines("NEW"), "")}
+            END''',
+        # Runs before expense_delete_splits removes the split lines.
+        f'''CREATE TRIGGER expense_window_delete BEFORE DELETE ON expense_tracker
+            BEGIN {window_total_upserts(expense_row_lines("OLD"), "-")}
+            END''',
+        f'''CREATE TRIGGER split_window_insert AFTER INSERT ON expense_splits
+            BEGIN
+            UPDATE expense_tracker SET split_amount = split_amount + NEW.amount WHERE id = NEW.expense_id;
+            {window_total_upserts(split_row_lines("NEW", ""), "")}
+            END''',
+        f'''CREATE TRIGGER split_window_update
+            AFTER UPDATE OF expense_category, amount ON expense_splits
+            BEGIN
+            UPDATE expense_tracker SET split_amount = split_amount - OLD.amount + NEW.amount WHERE id = NEW.expense_id;
+            {window_total_upserts(split_row_lines("OLD", "-"), "")}
+            {window_total_upserts(split_row_lines("NEW", ""), "")}
+            END''',
+        f'''CREATE TRIGGER split_window_delete AFTER DELETE ON expense_splits
+            BEGIN
+            UPDATE expense_tracker SET split_amount = split_amount - OLD.amount WHERE id = OLD.expense_id;
+            {window_total_upserts(split_row_lines("OLD", "-"), "")}
+            END''',
+    ]
+
+
+# Totals of one granularity recomputed from expense_lines, as
+# (expense_category, granularity, window_key, total) rows.
+def window_totals_select(granularity):
+    key = WINDOW_KEYS[granularity].format(date="expense_lines.date")
+    return f'''
+           SELECT LOWER(expense_category), '{granularity}', {key},
+           TOTAL(''' + converted_amount_sql("expense_lines", "amount") + f''')
+           FROM expense_lines
+           GROUP BY LOWER(expense_category), {key}'''
+
+
+# Recompute every running total from expense_lines in one grouped pass.
+def rebuild_budget_window_totals(cursor):
+    cursor.execute('''DELETE FROM budget_window_totals''')
+    for granularity in WINDOW_KEYS:
+        cursor.execute('''
+                       INSERT INTO budget_window_totals(expense_category, granularity, window_key, total)
+                       ''' + window_totals_select(granularity))
+
+
+# Raise an alert for each budget of a category whose window containing date
+# has crossed 80% or 100% of its budget. Each threshold is recorded once per
+# window, and a write crossing both gives a single alert.
+def check_budget_alerts(cursor, db, category, date):
+    alerts = []
+    for budget_id, category, budget_amount, budget_currency, period in get_category_budgets(cursor, category):
+        budget_amount = float(budget_amount or 0) * fx_rate(budget_currency, date)
+        if budget_amount <= 0:
+            continue
+        window_key, spent = window_spend(cursor, category, period, date)
+        raised = False
+        for threshold in ALERT_THRESHOLDS:
+            if spent < budget_amount * threshold:
+                continue
+            cursor.execute('''
+                           INSERT OR IGNORE INTO budget_alerts(
+                           expense_category, period, window_key, threshold, spent, budget, raised_at)
+                           VALUES(?, ?, ?, ?, ?, ?, ?)''',
+                           (category, period, window_key, threshold, spent, budget_amount,
+                            datetime.datetime.now().isoformat(timespec="seconds")))
+            raised = raised or cursor.rowcount == 1
+        if raised:
+            alerts.append(f"'{category}' has used {round(spent / budget_amount * 100)}% of its "
+                          f"£{round(budget_amount, 2)} budget per {BUDGET_PERIODS[period][0]}.")
+    db.commit()
+    for alert in alerts:
+        print(f"\n~ Budget alert: {alert} ~")
+    return alerts
+
+
+def input_budget_period():
+    choices = {"": "monthly", "w": "weekly", "weekly": "weekly", "m": "monthly", "monthly": "monthly",
+               "q": "quarterly", "quarterly": "quarterly", "r": "rolling_30", "rolling": "rolling_30"}
+    while True:
+        period = input("Please enter the budget period - weekly, monthly, quarterly or rolling 30 days (W, M, Q or R) [M]: ")
+        period = period.strip().lower()
+        if period in choices:
+            return choices[period]
+        print("\n~ Invalid budget period. Please try again. ~\n")
+
+
 # ------- Set budget for a category -------
 def add_budget():
     try:
         cursor, db = database_connect()
         print("\n****** Setting a budget ******")
-        cursor.execute('''
-                       SELECT DISTINCT expense_category FROM budget_tracker
-                       ''')
-        category_list = [category[0] for category in cursor.fetchall()]
         chosen_budget_category = input(
             "\nPlease enter which category you'd like to create a budget for: ").title()
+        budget_period = input_budget_period()
+        period_label = BUDGET_PERIODS[budget_period][0]
+        existing_periods = [budget[4] for budget in get_category_budgets(cursor, chosen_budget_category)]
+        budget_currency = input_currency(cursor)
         try:
             budget_amount = float(input(
-                "Please enter the budget amount in GBP (£) you'd like to spend per month: "))
-            if chosen_budget_category in category_list:
-                update_option = input(f"\nThe category '{chosen_budget_category}' already has a budget set. Want to replace it (Y or N): ").title()
+                f"Please enter the budget amount in {budget_currency} you'd like to spend per {period_label}: "))
+            if budget_period in existing_periods:
+                update_option = input(f"\nThe category '{chosen_budget_category}' already has a budget set per {period_label}. Want to replace it (Y or N): ").title()
                 if update_option == "Y":
                     cursor.execute('''
                                    UPDATE budget_tracker
-                                   SET budget = ?
-                                   WHERE expense_category = ?''',
-                                   (budget_amount, chosen_budget_category))
+                                   SET budget = ?, currency = ?
+                                   WHERE expense_category = ? AND period = ?''',
+                                   (budget_amount, budget_currency, chosen_budget_category, budget_period))
                     db.commit()
+                    cache_invalidate("budgets", ("budget", chosen_budget_category.lower()))
                     print(f"\nSuccess! Updated budget for {chosen_budget_category}.")
                 else:
                     print("\nCategory not updated.")
             else:
                 cursor.execute('''
                                INSERT INTO budget_tracker(
-                               expense_category, budget)
-                               VALUES(?, ?)''',
-                               (chosen_budget_category, budget_amount))
+                               expense_category, budget, currency, period)
+                               VALUES(?, ?, ?, ?)''',
+                               (chosen_budget_category, budget_amount, budget_currency, budget_period))
                 db.commit()
+                cache_invalidate("budgets", ("budget", chosen_budget_category.lower()))
                 print(f"\nSuccess! The following budget has been entered into the database:")
                 print(f"Expense Category:       {chosen_budget_category}")
-                print(f"Budget:                 £{budget_amount} per month")
+                print(f"Budget:                 {format_amount(budget_amount, budget_currency)} per {period_label}")
                 print("______________________________________________________________________\n")
         except ValueError:
             print("\n~ Error: Invalid input. Please enter a valid amount. ~\n")
@@ -741,8 +2124,7 @@ def view_budget():
     try:
         cursor, db = database_connect()
 
-        cursor.execute('''SELECT DISTINCT expense_category FROM expense_tracker''')
-        category_list = [row[0] for row in cursor.fetchall()]
+        category_list = get_expense_categories(cursor)
         
         print("\n****** Current Expense Categories ******")
         for category in category_list:
@@ -750,36 +2132,30 @@ def view_budget():
 
         chosen_category = input("\nPlease select which category you'd like to display: ").title().strip()
 
-        cursor.execute('''SELECT * FROM budget_tracker WHERE expense_category = ?''', (chosen_category,))
-        budget_data = cursor.fetchone()
-
-        if budget_data:
-            budget_id, category, budget_amount = budget_data
-            budget_amount = float(budget_amount)
-            
-            current_date = datetime.date.today()
-            current_month = current_date.month
-            current_year = current_date.year
-            cursor.execute('''SELECT SUM(expense_amount) FROM expense_tracker
-                  WHERE LOWER(expense_category) = ?
-                  AND strftime('%Y-%m', date) = ?
-                  ''', (chosen_category.lower(), f"{current_year}-{current_month:02}"))
-            total_monthly_expenses = cursor.fetchone()[0] or 0
-
-            if total_monthly_expenses < budget_amount:
-                status = "Hooray! Under budget."
-            elif total_monthly_expenses == budget_amount:
-                status = "On budget."
-            else:
-                status = "Uh-oh! Over budget."
+        budget_list = get_category_budgets(cursor, chosen_category)
 
+        if budget_list:
+            current_date = datetime.date.today().isoformat()
             print(f"\nSuccess! Please find the budget for '{chosen_category}' below:\n")
-            print(f"ID:                         {budget_id}")
-            print(f"Expense Category:           {category}")
-            print(f"Budget:                     £{budget_amount}")
-            print(f"Total Monthly Expenses:     £{total_monthly_expenses}")
-            print(f"Status:                     {status}")
-            print("______________________________________________________________________\n")
+            for budget_id, category, budget_amount, budget_currency, period in budget_list:
+                budget_amount = float(budget_amount) * fx_rate(budget_currency or REPORTING_CURRENCY,
+                                                               current_date)
+                window_key, total_window_expenses = window_spend(cursor, category, period, current_date)
+                period_label, spent_label = BUDGET_PERIODS[period]
+
+                if total_window_expenses < budget_amount:
+                    status = "Hooray! Under budget."
+                elif total_window_expenses == budget_amount:
+                    status = "On budget."
+                else:
+                    status = "Uh-oh! Over budget."
+
+                print(f"ID:                         {budget_id}")
+                print(f"Expense Category:           {category}")
+                print(f"Budget:                     £{budget_amount} per {period_label}")
+                print(f"{spent_label + ':':<28}£{round(total_window_expenses, 2)}")
+                print(f"Status:                     {status}")
+                print("______________________________________________________________________\n")
         else:
             print(f"\nBudget not found for '{chosen_category}'.\n")
 
@@ -813,6 +2189,7 @@ def add_goal():
                            VALUES(?, ?, ?)''',
                            (goal_name, goal_target, goal_amount))
             db.commit()
+            cache_invalidate("goals")
             print(f"\nSuccess! The following goal has been entered into the database:\n")
             print(f"Goal:                 {goal_name}")
             print(f"Target Date:          {goal_target}")
@@ -826,19 +2203,188 @@ def add_goal():
         db.rollback()
 
 
+# ------- Contribute savings to a financial goal -------
+def add_goal_contribution():
+    try:
+        cursor, db = database_connect()
+        print("\n****** Current Financial Goals ******\n")
+        for goal in get_goals(cursor):
+            print(f"{goal[0]}: {goal[1]} (£{goal[3]} by {goal[2]})")
+        
+        try:
+            chosen_id = int(input("\nPlease enter the id of the goal you'd like to contribute to: "))
+            if chosen_id not in [goal[0] for goal in get_goals(cursor)]:
+                print(f"\n~ No goal found with id '{chosen_id}'. ~\n")
+                return
+            
+            while True:
+                contribution_date = input("Please enter the date of the contribution [yyyy-mm-dd]: ")
+                try:
+                    datetime.datetime.strptime(contribution_date, '%Y-%m-%d')
+                    break
+                except ValueError:
+                    print("\n~ Invalid date format. Please try again. ~\n")
+            
+            contribution_amount = float(input("Please enter the contribution amount in GBP (£): "))
+            cursor.execute('''
+                           INSERT INTO goal_contributions(
+                           goal_id, date, amount)
+                           VALUES(?, ?, ?)''',
+                           (chosen_id, contribution_date, contribution_amount))
+            db.commit()
+            print(f"\nSuccess! £{contribution_amount} has been contributed to goal '{chosen_id}'.")
+            print("______________________________________________________________________\n")
+        except ValueError:
+            print("\n~ Error: Invalid input. Please enter a relevant number. ~\n")
+            db.rollback()
+    except sqlite3.Error as e:
+        print(f"\n~ The following error occurred: {e}. ~\n")
+        db.rollback()
+
+
+# ------- Calculate progress of financial goals -------
+AVERAGE_DAYS_PER_MONTH = 30.44
+
+
+# Monthly net figures in one pass over income and expenses, oldest first.
+MONTHLY_NET_SQL = ('''
+                   SELECT strftime('%Y-%m', date) AS month, SUM(amount)
+                   FROM (SELECT date, ''' + converted_amount_sql("income_tracker", "income_amount") + ''' AS amount
+                         FROM income_tracker
+                         UNION ALL
+                         SELECT date, -''' + converted_amount_sql("expense_tracker", "expense_amount") + '''
+                         FROM expense_tracker)
+                   GROUP BY month
+                   ORDER BY month
+                   ''')
+
+
+# Work out how far along each goal is. Contributions count towards their own
+# goal, and unassigned net savings go to goals in order of target date, so
+# goals must be passed in that order. Completion dates are projected from the
+# average monthly net figure. Progress is yielded one goal at a time.
+def calculate_goal_progress(cursor, goals, today=None):
+    cursor.execute(MONTHLY_NET_SQL)
+    total_net = 0
+    months = 0
+    for month, net in stream_rows(cursor):
+        total_net += net or 0
+        months += 1
+    
+    cursor.execute('''
+                   SELECT goal_id, SUM(amount) FROM goal_contributions GROUP BY goal_id
+                   ''')
+    contributions = dict(cursor.fetchall())
+    return goal_progress(goals, total_net, months, contributions, today or datetime.date.today())
+
+
+# Progress of each goal given the net total over a number of months and the
+# contributions made to each goal, as seen on the given day. A goal is on
+# track when it is complete or projected to finish by its target date.
+def goal_progress(goals, total_net, months, contributions, today):
+    savings_rate = total_net / months if months else 0
+    unallocated = max(total_net - sum(contributions.values()), 0)
+    
+    outstanding = 0
+    for goal_id, goal, target_date, target_amount in goals:
+        target_amount = float(target_amount or 0)
+        saved = contributions.get(goal_id, 0)
+        allocation = min(max(target_amount - saved, 0), unallocated)
+        unallocated -= allocation
+        saved += allocation
+        remaining = max(target_amount - saved, 0)
+        
+        target = datetime.datetime.strptime(target_date, '%Y-%m-%d').date()
+        months_left = (target - today).days / AVERAGE_DAYS_PER_MONTH
+        if remaining == 0:
+            required_monthly = 0
+        elif months_left < 1:
+            required_monthly = remaining
+        else:
+            required_monthly = remaining / months_left
+        
+        # Goals are funded in target date order, so each one finishes once
+        # everything due before it has also been saved for.
+        outstanding += remaining
+        if remaining == 0:
+            projected_date = today
+        elif savings_rate > 0:
+            projected_date = today + datetime.timedelta(
+                days=outstanding / savings_rate * AVERAGE_DAYS_PER_MONTH)
+        else:
+            projected_date = None
+        
+        yield {
+            "id": goal_id,
+            "goal": goal,
+            "target_date": target_date,
+            "target_amount": target_amount,
+            "saved": saved,
+            "percent_complete": saved / target_amount * 100 if target_amount else 100.0,
+            "required_monthly": required_monthly,
+            "projected_date": projected_date,
+            "on_track": remaining == 0 or (projected_date is not None and projected_date <= target),
+        }
+
+
+def month_end(month):
+    year, month_number = int(month[:4]), int(month[5:7])
+    next_month = datetime.date(year + month_number // 12, month_number % 12 + 1, 1)
+    return next_month - datetime.timedelta(days=1)
+
+
+# Goal progress as of the last day of each of the given months, built up from
+# one pass over the monthly net figures and contributions. Months with only
+# goal contributions do not count towards the average monthly net figure, as
+# in calculate_goal_progress.
+def monthly_goal_progress(cursor, goals, months):
+    goals = sorted(goals, key=lambda goal: goal[2])
+    history = {}
+    cursor.execute(MONTHLY_NET_SQL)
+    for month, net in stream_rows(cursor):
+        history[month] = [net or 0, {}]
+    cursor.execute('''
+                   SELECT strftime('%Y-%m', date) AS month, goal_id, SUM(amount)
+                   FROM goal_contributions GROUP BY month, goal_id
+                   ''')
+    for month, goal_id, amount in cursor.fetchall():
+        history.setdefault(month, [None, {}])[1][goal_id] = amount
+    
+    progress = {}
+    total_net = 0
+    net_months = 0
+    contributions = Counter()
+    wanted = set(months)
+    for month in sorted(history):
+        net, month_contributions = history[month]
+        if net is not None:
+            total_net += net
+            net_months += 1
+        contributions.update(month_contributions)
+        if month in wanted:
+            progress[month] = list(goal_progress(goals, total_net, net_months, contributions, month_end(month)))
+    return progress
+
+
 # ------- View progress of financial goals -------
 def track_goals():
     try:
         cursor, db = database_connect()
-        cursor.execute('''
-                       SELECT * FROM financial_goals_tracker
-                       ''')
-        goals_list = cursor.fetchall()
+        goals_cursor = db.cursor()
+        goals_cursor.execute('''
+                             SELECT id, goal, target_date, target_amount
+                             FROM financial_goals_tracker ORDER BY target_date
+                             ''')
         print("\n****** Current Financial Goals ******\n")
-        for goal in goals_list:
-            print(f"Goal:               {goal[1]}")
-            print(f"Target Date:        {goal[2]}")
-            print(f"Target Amount:      £{goal[3]}\n")
+        for goal in calculate_goal_progress(cursor, stream_rows(goals_cursor, GoalRecord)):
+            projected_date = goal["projected_date"] or "Not on track"
+            print(f"Goal:                   {goal['goal']}")
+            print(f"Target Date:            {goal['target_date']}")
+            print(f"Target Amount:          £{goal['target_amount']}")
+            print(f"Saved So Far:           £{round(goal['saved'], 2)}")
+            print(f"Percent Complete:       {round(goal['percent_complete'], 1)}%")
+            print(f"Required Per Month:     £{round(goal['required_monthly'], 2)}")
+            print(f"Projected Completion:   {projected_date}\n")
         print("\n****** Financial Progress ******\n")
         print("______________________________________________________________________")
         current_total_expenses = round(total_expenses(), 2)
@@ -855,25 +2401,253 @@ def track_goals():
         db.rollback()
 
 
+# ------- Monthly statements -------
+# Statements are built from one aggregated query over income, expenses and
+# goal contributions per month and category. Each month's aggregate rows,
+# together with the budgets and goals, are hashed into a fingerprint, and a
+# statement is only re-rendered when its fingerprint has changed since it was
+# last written to REPORTS_DIRECTORY.
+REPORTS_DIRECTORY = "./reports"
+REPORT_FORMATS = ("html", "csv", "md")
+REPORT_WORKERS = 4
+
+
+def load_monthly_aggregates(cursor, first_month=None, last_month=None):
+    cursor.execute('''
+                   SELECT month, kind, category, SUM(amount), COUNT(*), MAX(id), TOTAL(id)
+                   FROM (SELECT strftime('%Y-%m', date) AS month, 'income' AS kind,
+                         income_category AS category, ''' + converted_amount_sql("income_tracker", "income_amount") + ''' AS amount, id
+                         FROM income_tracker
+                         UNION ALL
+                         SELECT strftime('%Y-%m', date), 'expense', expense_category,
+                         ''' + converted_amount_sql("expense_lines", "amount") + ''', expense_id
+                         FROM expense_lines
+                         UNION ALL
+                         SELECT strftime('%Y-%m', goal_contributions.date), 'goal', goal_contributions.goal_id,
+                         goal_contributions.amount, goal_contributions.id
+                         FROM goal_contributions)
+                   WHERE month BETWEEN COALESCE(?, '0000-00') AND COALESCE(?, '9999-99')
+                   GROUP BY month, kind, category
+                   ORDER BY month, kind, category
+                   ''', (first_month, last_month))
+    monthly_rows = {}
+    for row in cursor:
+        monthly_rows.setdefault(row[0], []).append(row[1:])
+    return monthly_rows
+
+
+def build_statement(month, rows, budgets, goals):
+    income = {category: total or 0 for kind, category, total, *_ in rows if kind == "income"}
+    expenses = {category: total or 0 for kind, category, total, *_ in rows if kind == "expense"}
+    contributions = {goal_id: total or 0 for kind, goal_id, total, *_ in rows if kind == "goal"}
+    
+    budget_lines = []
+    for category, budget, currency in budgets:
+        budget = float(budget or 0) * fx_rate(currency, f"{month}-01")
+        spent = expenses.get(category, 0)
+        budget_lines.append((category, budget, spent, budget - spent))
+    
+    # goals holds each goal's progress as of the end of the month.
+    goal_lines = [(goal["goal"], goal["target_date"], goal["target_amount"], contributions.get(goal["id"], 0),
+                   goal["saved"], goal["percent_complete"], "Yes" if goal["on_track"] else "No")
+                  for goal in goals]
+    return {
+        "month": month,
+        "income": sorted(income.items()),
+        "expenses": sorted(expenses.items()),
+        "total_income": sum(income.values()),
+        "total_expenses": sum(expenses.values()),
+        "budgets": budget_lines,
+        "goals": goal_lines,
+    }
+
+
+def statement_sections(statement):
+    net = statement["total_income"] - statement["total_expenses"]
+    return [
+        ("Income", ("Category", "Amount"),
+         statement["income"] + [("Total", statement["total_income"])]),
+        ("Expenses", ("Category", "Amount"),
+         statement["expenses"] + [("Total", statement["total_expenses"])]),
+        ("Net Income", ("", "Amount"), [("Net", net)]),
+        ("Budget Variance", ("Category", "Budget", "Spent", "Remaining"), statement["budgets"]),
+        ("Financial Goals", ("Goal", "Target Date", "Target Amount", "Contributed", "Saved So Far",
+                             "Percent Complete", "On Track"), statement["goals"]),
+    ]
+
+
+def format_cell(value):
+    return f"{value:.2f}" if isinstance(value, (int, float)) else str(value)
+
+
+def render_statement(statement, report_format):
+    title = f"Monthly Statement {statement['month']} ({REPORTING_CURRENCY})"
+    sections = statement_sections(statement)
+    
+    if report_format == "csv":
+        output = io.StringIO()
+        writer = csv.writer(output)
+        for section, header, lines in sections:
+            writer.writerow((section,) + header)
+            writer.writerows((section,) + tuple(format_cell(value) for value in line) for line in lines)
+        return output.getvalue()
+    
+    if report_format == "md":
+        output = [f"# {title}"]
+        for section, header, lines in sections:
+            output += ["", f"## {section}", "", "| " + " | ".join(header) + " |",
+                       "|" + "---|" * len(header)]
+            output += ["| " + " | ".join(format_cell(value) for value in line) + " |" for line in lines]
+        return "\n".join(output) + "\n"
+    
+    if report_format == "html":
+        output = [f"<!DOCTYPE html>\n<html>\n<head><meta charset=\"utf-8\"><title>{html.escape(title)}</title></head>",
+                  f"<body>\n<h1>{html.escape(title)}</h1>"]
+        for section, header, lines in sections:
+            output.append(f"<h2>{html.escape(section)}</h2>\n<table>")
+            output.append("<tr>" + "".join(f"<th>{html.escape(cell)}</th>" for cell in header) + "</tr>")
+            output += ["<tr>" + "".join(f"<td>{html.escape(format_cell(value))}</td>" for value in line) + "</tr>"
+                       for line in lines]
+            output.append("</table>")
+        output.append("</body>\n</html>")
+        return "\n".join(output) + "\n"
+    
+    raise ValueError(f"Unknown report format '{report_format}'")
 
- # ========== Main ==========
-print("\n***** Welcome to your Expense and Budget Tracker App *****\n")
-create_expense_table()
-insert_prepopulated_expenses()
-create_income_table()
-insert_prepopulated_income()
-create_budget_table()
-insert_prepopulated_budget()
-create_goals_table()
-insert_prepopulated_goals()
+
+def write_statement(statement, report_format, directory):
+    path = os.path.join(directory, f"statement-{statement['month']}.{report_format}")
+    with open(path, "w", encoding="utf-8", newline="") as report_file:
+        report_file.write(render_statement(statement, report_format))
+    return path
+
+
+# Generate statements for every month in the range (all months by default),
+# skipping months whose statements are already up to date. Returns the paths
+# of the statements that were written.
+def generate_monthly_statements(first_month=None, last_month=None, formats=REPORT_FORMATS,
+                                directory=REPORTS_DIRECTORY, force=False):
+    written = []
+    try:
+        cursor, db = database_connect()
+        monthly_rows = load_monthly_aggregates(cursor, first_month, last_month)
+        budgets = get_budgets(cursor)
+        goals = get_goals(cursor)
+        
+        cursor.execute('''SELECT month, format, fingerprint, path FROM report_statements''')
+        previous = {(month, report_format): (fingerprint, path)
+                    for month, report_format, fingerprint, path in cursor.fetchall()}
+        
+        # Statements for months that no longer have any rows are removed.
+        stale = [(month, report_format, path) for (month, report_format), (_, path) in previous.items()
+                 if month not in monthly_rows and report_format in formats
+                 and (first_month or "0000-00") <= month <= (last_month or "9999-99")]
+        for month, report_format, path in stale:
+            if path and os.path.exists(path):
+                os.remove(path)
+        cursor.executemany('''DELETE FROM report_statements WHERE month = ? AND format = ?''',
+                           [(month, report_format) for month, report_format, path in stale])
+        db.commit()
+        
+        # The fingerprint covers the rates used to convert each month's budgets
+        # and the goal progress, which depends on every month before it.
+        goal_lines = monthly_goal_progress(cursor, goals, monthly_rows)
+        shared = repr((budgets, REPORTING_CURRENCY))
+        jobs = []
+        for month, rows in monthly_rows.items():
+            budget_rates = [fx_rate(currency, f"{month}-01") for _, _, currency in budgets]
+            fingerprint = hashlib.sha1(f"{rows!r}{shared}{budget_rates!r}{goal_lines[month]!r}".encode()).hexdigest()
+            for report_format in formats:
+                fingerprint_before, path = previous.get((month, report_format), (None, None))
+                if force or fingerprint != fingerprint_before or not path or not os.path.exists(path):
+                    jobs.append((month, report_format, fingerprint))
+        if not jobs:
+            return written
+        
+        os.makedirs(directory, exist_ok=True)
+        statements = {month: build_statement(month, monthly_rows[month], budgets, goal_lines[month])
+                      for month in {job[0] for job in jobs}}
+        # Threads share the built statements without copying them to other
+        # processes, and each job is mostly a file write, which releases the GIL.
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=REPORT_WORKERS) as executor:
+            paths = list(executor.map(lambda job: write_statement(statements[job[0]], job[1], directory), jobs))
+        
+        generated_at = datetime.datetime.now().isoformat(timespec="seconds")
+        cursor.executemany('''
+                           INSERT OR REPLACE INTO report_statements(month, format, fingerprint, path, generated_at)
+                           VALUES(?, ?, ?, ?, ?)''',
+                           [(month, report_format, fingerprint, path, generated_at)
+                            for (month, report_format, fingerprint), path in zip(jobs, paths)])
+        db.commit()
+        written = paths
+    except (sqlite3.Error, OSError, ValueError) as e:
+        print(f"\n~ The following error occurred while generating statements: {e}. ~\n")
+        db.rollback()
+    return written
 
 
+# ------- Generate monthly statements -------
+def generate_statements():
+    chosen_month = input("\nPlease enter the month [yyyy-mm] to generate, or leave blank for all months: ").strip()
+    if chosen_month:
+        try:
+            datetime.datetime.strptime(chosen_month, '%Y-%m')
+        except ValueError:
+            print("\n~ Invalid month format. Please try again. ~\n")
+            return
+    written = generate_monthly_statements(chosen_month or None, chosen_month or None)
+    print(f"\nSuccess! {len(written)} statements have been written to '{REPORTS_DIRECTORY}'.")
+    for path in written:
+        print(f"- {path}")
+    print("______________________________________________________________________\n")
+
 
 
-# Menu options for the user -------
-while True:
+ # ========== Main ==========
+# ------- Preparing the database -------
+# The schema version is recorded last, so the command line can tell that setup
+# has completed without loading this file.
+def setup_database():
+    create_settings_table()
+    create_expense_table()
+    insert_prepopulated_expenses()
+    create_income_table()
+    insert_prepopulated_income()
+    create_budget_table()
+    insert_prepopulated_budget()
+    create_goals_table()
+    insert_prepopulated_goals()
+    create_goal_contributions_table()
+    add_currency_columns()
+    upgrade_budget_table()
+    create_split_and_tag_tables()
+    create_fx_rates_table()
+    create_currency_triggers()
+    create_budget_window_tables()
+    load_fx_rates()
+    create_category_rules_table()
+    create_expense_indexes()
+    create_report_statements_table()
+    record_schema_version()
+
+
+def record_schema_version():
     try:
-        menu = int(input('''From the following options, please choose what you'd like to do (1-11):
+        cursor, db = database_connect()
+        save_setting(cursor, SCHEMA_VERSION_SETTING, SCHEMA_VERSION)
+        db.commit()
+    
+    except sqlite3.Error as e:
+        print(f"\nThe following error occurred: {e}.\n")
+        db.rollback()
+
+
+# ------- Menu options for the user -------
+def main_menu():
+    while True:
+        try:
+            menu = int(input('''From the following options, please choose what you'd like to do (1-16):
         1. Add expense
         2. View expenses
         3. View expenses by category
@@ -884,47 +2658,73 @@ while True:
         8. View budget for a category
         9. Set financial goals
         10. View progress towards financial goals
-        11. Quit
+        11. Contribute savings to a financial goal
+        12. Auto-categorise transactions
+        13. Check for duplicate and unusual expenses
+        14. Generate monthly statements
+        15. View expenses by tag
+        16. Quit
         : '''))
-        if menu == 1:
-            add_expense()
+            if menu == 1:
+                add_expense()
         
-        elif menu == 2:
-            view_expenses()
+            elif menu == 2:
+                view_expenses()
         
-        elif menu == 3:
-            view_category_expenses()
+            elif menu == 3:
+                view_category_expenses()
         
-        elif menu == 4:
-            add_income()
+            elif menu == 4:
+                add_income()
         
-        elif menu == 5:
-            view_income()
+            elif menu == 5:
+                view_income()
 
-        elif menu == 6:
-            view_category_income()
+            elif menu == 6:
+                view_category_income()
 
-        elif menu == 7:
-            add_budget()
+            elif menu == 7:
+                add_budget()
         
-        elif menu == 8:
-            view_budget()
+            elif menu == 8:
+                view_budget()
         
-        elif menu == 9:
-            add_goal()
-
-        elif menu == 10:
-            total_expenses()
-            total_income()
-            total_net_income()
-            track_goals()
+            elif menu == 9:
+                add_goal()
+
+            elif menu == 10:
+                total_expenses()
+                total_income()
+                total_net_income()
+                track_goals()
         
-        elif menu == 11:
-            print(f'\n***** Goodbye! Thank you for using your friendly neighbourhood, Expense and Budget Tracker App! *****\n')
-            break
+            elif menu == 11:
+                add_goal_contribution()
         
-        else:
-            print("\n~ Oops - incorrect input. Please try again. ~\n")
+            elif menu == 12:
+                manage_category_rules()
+        
+            elif menu == 13:
+                view_anomalies()
+        
+            elif menu == 14:
+                generate_statements()
+        
+            elif menu == 15:
+                view_tag_expenses()
+        
+            elif menu == 16:
+                print(f'\n***** Goodbye! Thank you for using your friendly neighbourhood, Expense and Budget Tracker App! *****\n')
+                break
+        
+            else:
+                print("\n~ Oops - incorrect input. Please try again. ~\n")
+
+        except Exception as e:
+            print(f"\n~ The following error occurred: {e}. ~\n")
+
 
-    except Exception as e:
-        print(f"\n~ The following error occurred: {e}. ~\n")
\ No newline at end of file
+if __name__ == "__main__":
+    print("\n***** Welcome to your Expense and Budget Tracker App *****\n")
+    setup_database()
+    main_menu()
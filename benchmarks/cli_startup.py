@@ -0,0 +1,82 @@
+# ========== Command Line Startup Benchmark ==========
+# Times complete runs of tracker_cli.py in new processes against a large
+# database, next to a bare interpreter start and the CLI's --help (which
+# imports no subcommand and not the tracker itself). Exits with status 1 if
+# the median budget-status run takes longer than the target.
+#
+# The commands run next to an fx_rates folder holding ten years of daily rates
+# for five currencies, as a long-running install would have. One untimed run
+# of each command comes first, so the timings include the bytecode cache and
+# the rates already loaded, as a normal install would have them.
+#
+# Usage: python benchmarks/cli_startup.py [expenses] [runs]
+import datetime
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CLI_PATH = os.path.join(ROOT, "tracker_cli.py")
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+from tracker_fixtures import BUILD_CATEGORIES, build_database
+
+TARGET_MS = 100
+RATE_CURRENCIES = ("EUR", "USD", "JPY", "CHF", "SEK")
+RATE_YEARS = 10
+
+
+def write_rate_files(directory):
+    os.makedirs(directory)
+    for currency in RATE_CURRENCIES:
+        with open(os.path.join(directory, f"{currency.lower()}.csv"), "w") as rates_file:
+            rates_file.write("date,currency,rate\n")
+            for day in range(RATE_YEARS * 365):
+                rates_file.write(f"{datetime.date(2015, 1, 1) + datetime.timedelta(days=day)},"
+                                 f"{currency},{random.uniform(0.5, 1.5):.4f}\n")
+
+
+def time_runs(command, runs, env, cwd):
+    subprocess.run(command, env=env, cwd=cwd, stdout=subprocess.DEVNULL, check=True)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, cwd=cwd, stdout=subprocess.DEVNULL, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), statistics.median(timings)
+
+
+def main():
+    expenses = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "large.db")
+        build_database(database_path, expenses)
+        write_rate_files(os.path.join(directory, "fx_rates"))
+        env = {name: value for name, value in os.environ.items() if name != "PYTHONDONTWRITEBYTECODE"}
+        env["TRACKER_DB"] = database_path
+
+        commands = [
+            ("python -c pass", [sys.executable, "-c", "pass"]),
+            ("tracker_cli.py --help", [sys.executable, CLI_PATH, "--help"]),
+            ("tracker_cli.py budget-status", [sys.executable, CLI_PATH, "budget-status", "--date", "2022-06-15"]),
+        ]
+        print(f"Expenses: {expenses:,}   Budgets: {BUILD_CATEGORIES * 4}   Runs: {runs}\n")
+        print(f"{'Command':<32}{'min ms':>10}{'median ms':>12}")
+        for name, command in commands:
+            fastest, median = time_runs(command, runs, env, directory)
+            print(f"{name:<32}{fastest:>10.1f}{median:>12.1f}")
+
+    if median > TARGET_MS:
+        print(f"\nbudget-status median of {median:.1f} ms is over the {TARGET_MS} ms target.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
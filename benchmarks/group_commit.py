@@ -0,0 +1,69 @@
+# ========== Group Commit Benchmark ==========
+# Compares inserts per second when every expense is committed on its own (as
+# the interactive menu does) with the same inserts submitted through the
+# WriteQueue by several concurrent callers. The database is fully set up, so
+# both include the budget window triggers every real insert runs.
+#
+# Usage: python benchmarks/group_commit.py [rows] [callers]
+import os
+import sys
+import tempfile
+import threading
+import time
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+from tracker_fixtures import load_app
+
+
+def per_row_commit(app, rows):
+    cursor, db = app.database_connect()
+    start = time.perf_counter()
+    for row in range(rows):
+        cursor.execute('''
+                       INSERT INTO expense_tracker
+                       (date, description, expense_category, expense_amount, currency)
+                       VALUES (?, ?, ?, ?, ?)''',
+                       ("2024-05-01", f"Expense {row}", "Food", 1.5, "GBP"))
+        db.commit()
+    return time.perf_counter() - start
+
+
+def group_commit(app, rows, callers):
+    def caller(write_queue, count):
+        for row in range(count):
+            app.submit_expense(write_queue, "2024-05-01", f"Expense {row}", "Food", 1.5).result()
+
+    with app.WriteQueue() as write_queue:
+        threads = [threading.Thread(target=caller, args=(write_queue, rows // callers))
+                   for _ in range(callers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    callers = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    rows -= rows % callers
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = load_app(os.path.join(directory, "per_row.db"))
+        app.setup_database()
+        per_row_seconds = per_row_commit(app, rows)
+
+        app = load_app(os.path.join(directory, "group.db"))
+        app.setup_database()
+        group_seconds = group_commit(app, rows, callers)
+
+    print(f"Rows inserted:              {rows}")
+    print(f"Per-row commit:             {rows / per_row_seconds:,.0f} inserts/sec")
+    print(f"Group commit ({callers} callers):  {rows / group_seconds:,.0f} inserts/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# ========== Command Line Tests ==========
+# tracker_cli.py is run as a script against a database and a rates folder in
+# a temporary directory. Once the database is set up, budget-status must not
+# write to it, and the rates are only loaded again when a rate file changes.
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CLI_PATH = os.path.join(ROOT, "tracker_cli.py")
+
+
+class CommandLineTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.database_path = os.path.join(self.directory, "tracker.db")
+        os.makedirs(os.path.join(self.directory, "fx_rates"))
+        self.write_rates(0.85)
+
+    def write_rates(self, rate):
+        with open(os.path.join(self.directory, "fx_rates", "eur.csv"), "w") as rates_file:
+            rates_file.write(f"date,currency,rate\n2024-01-01,EUR,{rate}\n")
+
+    def run_cli(self, *args):
+        env = dict(os.environ, TRACKER_DB=self.database_path)
+        completed = subprocess.run([sys.executable, CLI_PATH, *args], cwd=self.directory, env=env,
+                                   capture_output=True, text=True, timeout=60)
+        self.assertEqual(completed.returncode, 0, completed.stdout + completed.stderr)
+        return json.loads(completed.stdout)
+
+    def eur_rate(self):
+        db = sqlite3.connect(self.database_path)
+        try:
+            return db.execute('''SELECT rate FROM fx_rates WHERE currency = 'EUR' ''').fetchone()[0]
+        finally:
+            db.close()
+
+    def test_budget_status_only_reads(self):
+        self.run_cli("budget-status", "--date", "2024-06-01")
+
+        # Another connection holds the write lock, so any write would fail.
+        db = sqlite3.connect(self.database_path, timeout=0)
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            result = self.run_cli("budget-status", "--date", "2024-06-01")
+        finally:
+            db.close()
+        self.assertEqual(result["date"], "2024-06-01")
+
+    def test_rates_reload_when_files_change(self):
+        self.run_cli("budget-status")
+        self.assertEqual(self.eur_rate(), 0.85)
+
+        self.write_rates(0.9)
+        self.run_cli("budget-status")
+        self.assertEqual(self.eur_rate(), 0.9)
+
+
+if __name__ == "__main__":
+    unittest.main()
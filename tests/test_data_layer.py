@@ -0,0 +1,429 @@
+# ========== Data Layer Tests ==========
+# Random sequences of adds, edits, deletes, splits, tags and category renames
+# are run through the menus themselves, with input() answered from a script,
+# against an in-memory and an on-disk database. A plain Python model of the
+# expenses and income is kept alongside, working out budget windows with
+# datetime rather than the app's SQL. Every few steps the totals, net income,
+# category list, tag totals and the spend in every budget window are compared
+# with the model, and check_aggregates must find nothing wrong.
+#
+# Usage: python -m pytest tests  (or python -m unittest discover tests)
+import contextlib
+import datetime
+import io
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from tracker_fixtures import check_aggregates, load_app
+
+
+CATEGORIES = ["Food", "Entertainment", "Transportation", "Housing", "Travel", "Gifts"]
+TAGS = ["holiday", "work", "family"]
+PERIODS = ["weekly", "monthly", "quarterly", "rolling_30"]
+ROLLING_DAYS = 30
+EUR_RATE = 0.85
+STEPS = 300
+SEEDS = 5
+CHECK_EVERY = 25
+TOLERANCE = 0.005
+
+# Dates run from December 2023 to February 2025, and half of them fall within
+# a week of a year end, so windows crossing New Year are exercised.
+FIRST_DATE = datetime.date(2023, 12, 1)
+DAYS = 430
+YEAR_ENDS = [datetime.date(2023, 12, 31), datetime.date(2024, 12, 31)]
+
+
+# Run a menu with scripted answers, one per prompt. The question asked when a
+# new expense raises warnings is always answered yes.
+def run_menu(menu, *answers):
+    answers = list(answers)
+
+    def reply(prompt=""):
+        if prompt.startswith("Would you still like to save"):
+            return "Y"
+        if not answers:
+            raise AssertionError(f"No answer scripted for {prompt!r}")
+        return answers.pop(0)
+
+    output = io.StringIO()
+    with mock.patch("builtins.input", reply), contextlib.redirect_stdout(output):
+        menu()
+    if answers:
+        raise AssertionError(f"Answers left over after {menu.__name__}: {answers}")
+    return output.getvalue()
+
+
+def random_date(rng):
+    if rng.random() < 0.5:
+        day = rng.choice(YEAR_ENDS) + datetime.timedelta(days=rng.randint(-7, 7))
+    else:
+        day = FIRST_DATE + datetime.timedelta(days=rng.randrange(DAYS))
+    return day.isoformat()
+
+
+# ------- Reference model -------
+# Whether day falls in the budget window of the given period that contains
+# reference.
+def in_window(period, day, reference):
+    if period == "weekly":
+        return day - datetime.timedelta(days=day.weekday()) == reference - datetime.timedelta(days=reference.weekday())
+    if period == "monthly":
+        return (day.year, day.month) == (reference.year, reference.month)
+    if period == "quarterly":
+        return (day.year, (day.month - 1) // 3) == (reference.year, (reference.month - 1) // 3)
+    return reference - datetime.timedelta(days=ROLLING_DAYS - 1) <= day <= reference
+
+
+# The key the app should report for the window containing day.
+def window_key(period, day):
+    if period == "weekly":
+        return (day - datetime.timedelta(days=day.weekday())).isoformat()
+    if period == "monthly":
+        return f"{day.year}-{day.month:02}"
+    if period == "quarterly":
+        return f"{day.year}-Q{(day.month - 1) // 3 + 1}"
+    return day.isoformat()
+
+
+class Model:
+    def __init__(self, cursor):
+        cursor.execute('''SELECT id, date, expense_category, expense_amount, currency FROM expense_tracker''')
+        self.expenses = {row[0]: list(row[1:]) for row in cursor.fetchall()}
+        cursor.execute('''SELECT id, expense_id, expense_category, amount FROM expense_splits''')
+        self.splits = {row[0]: list(row[1:]) for row in cursor.fetchall()}
+        cursor.execute('''SELECT id, date, income_category, income_amount, currency FROM income_tracker''')
+        self.income = {row[0]: list(row[1:]) for row in cursor.fetchall()}
+        self.tags = {}
+
+    @staticmethod
+    def converted(amount, currency):
+        return amount * EUR_RATE if currency == "EUR" else amount
+
+    def split_total(self, expense_id):
+        return sum(amount for parent, _, amount in self.splits.values() if parent == expense_id)
+
+    def unsplit(self, expense_id):
+        return self.expenses[expense_id][2] - self.split_total(expense_id)
+
+    # (category, date, amount in the reporting currency) for every expense line.
+    def lines(self):
+        for expense_id, (date, category, amount, currency) in self.expenses.items():
+            yield category, date, self.converted(self.unsplit(expense_id), currency)
+        for expense_id, category, amount in self.splits.values():
+            date, _, _, currency = self.expenses[expense_id]
+            yield category, date, self.converted(amount, currency)
+
+    def window_spend(self, category, period, date):
+        reference = datetime.date.fromisoformat(date)
+        return sum(amount for line_category, line_date, amount in self.lines()
+                   if line_category == category
+                   and in_window(period, datetime.date.fromisoformat(line_date), reference))
+
+    def categories(self):
+        return ({category for _, category, _, _ in self.expenses.values()}
+                | {category for _, category, _ in self.splits.values()})
+
+    def tag_total(self, tag):
+        expense_ids = self.tags.get(tag, set())
+        return len(expense_ids), sum(self.converted(self.expenses[expense_id][2], self.expenses[expense_id][3])
+                                     for expense_id in expense_ids)
+
+
+# ------- Generated flows -------
+def latest_id(cursor, table):
+    cursor.execute(f'''SELECT MAX(id) FROM {table}''')
+    return cursor.fetchone()[0]
+
+
+def random_step(app, cursor, model, rng):
+    expense_ids = list(model.expenses)
+    step = rng.choice(["add", "add", "add", "date", "category", "amount", "delete",
+                       "split", "tag", "rename", "income", "income_delete"])
+    if step == "add" or not expense_ids:
+        date, category = random_date(rng), rng.choice(CATEGORIES)
+        amount, currency = round(rng.uniform(1, 200), 2), rng.choice(["GBP", "GBP", "EUR"])
+        run_menu(app.add_expense, date, "Generated expense", category,
+                 "" if currency == "GBP" else currency, str(amount))
+        model.expenses[latest_id(cursor, "expense_tracker")] = [date, category, amount, currency]
+        return
+
+    expense_id = rng.choice(expense_ids)
+    if step == "date":
+        date = random_date(rng)
+        run_menu(app.view_expenses, "Y", str(expense_id), "1", date, "N")
+        model.expenses[expense_id][0] = date
+    elif step == "category":
+        category = rng.choice(CATEGORIES)
+        run_menu(app.view_expenses, "Y", str(expense_id), "3", category, "N")
+        model.expenses[expense_id][1] = category
+    elif step == "amount":
+        # Expenses with split lines are often given an amount below the split
+        # total, which must be refused.
+        split_total = model.split_total(expense_id)
+        amount = round(rng.uniform(0, 2 * split_total if split_total else 200), 2)
+        if abs(amount - split_total) < 0.01:
+            return
+        run_menu(app.view_expenses, "Y", str(expense_id), "4", str(amount), "N")
+        if amount > split_total:
+            model.expenses[expense_id][2] = amount
+    elif step == "delete":
+        run_menu(app.view_expenses, "Y", str(expense_id), "5", "Y", "N")
+        del model.expenses[expense_id]
+        model.splits = {split_id: split for split_id, split in model.splits.items() if split[0] != expense_id}
+        # The menu gives new expenses the next id after the largest, so a
+        # deleted id can come back and must not bring its tags with it.
+        for tagged in model.tags.values():
+            tagged.discard(expense_id)
+    elif step == "split":
+        # Some splits ask for more than is left, which must be refused.
+        unsplit = model.unsplit(expense_id)
+        amount = round(rng.uniform(0, 1.25 * unsplit), 2)
+        if abs(amount - unsplit) < 0.01:
+            return
+        category = rng.choice(CATEGORIES)
+        run_menu(app.view_expenses, "Y", str(expense_id), "6", category, str(amount), "N")
+        if 0 < amount < unsplit:
+            model.splits[latest_id(cursor, "expense_splits")] = [expense_id, category, amount]
+    elif step == "tag":
+        tag = rng.choice(TAGS)
+        run_menu(app.view_expenses, "Y", str(expense_id), "7", tag, "N")
+        model.tags.setdefault(tag, set()).add(expense_id)
+    elif step == "rename":
+        old_category, new_category = rng.sample(CATEGORIES, 2)
+        run_menu(app.view_category_expenses, old_category, "Y", new_category)
+        # Expense and split rows both keep their category second.
+        for row in list(model.expenses.values()) + list(model.splits.values()):
+            if row[1] == old_category:
+                row[1] = new_category
+    elif step == "income":
+        date, amount = random_date(rng), round(rng.uniform(10, 2000), 2)
+        run_menu(app.add_income, date, "Generated income", "Job", "", str(amount))
+        model.income[latest_id(cursor, "income_tracker")] = [date, "Job", amount, "GBP"]
+    elif step == "income_delete" and model.income:
+        income_id = rng.choice(list(model.income))
+        run_menu(app.view_income, "Y", str(income_id), "5", "Y", "N")
+        del model.income[income_id]
+
+
+def compare(app, cursor, model, rng):
+    failures = []
+
+    def check(name, actual, expected):
+        if abs((actual or 0) - expected) > TOLERANCE:
+            failures.append(f"{name}: {actual} != {expected}")
+
+    expected_expenses = sum(model.converted(amount, currency) for _, _, amount, currency in model.expenses.values())
+    expected_income = sum(model.converted(amount, currency) for _, _, amount, currency in model.income.values())
+    check("total_expenses", app.total_expenses(), expected_expenses)
+    check("total_income", app.total_income(), expected_income)
+    check("total_net_income", app.total_net_income(), expected_income - expected_expenses)
+
+    if set(app.get_expense_categories(cursor)) != model.categories():
+        failures.append(f"categories: {sorted(app.get_expense_categories(cursor))} != {sorted(model.categories())}")
+    for tag in TAGS:
+        count, total = app.tag_total(cursor, tag)
+        expected_count, expected_total = model.tag_total(tag)
+        if count != expected_count:
+            failures.append(f"tag '{tag}' count: {count} != {expected_count}")
+        check(f"tag '{tag}' total", total, expected_total)
+
+    dates = [random_date(rng) for _ in range(3)]
+    for category in CATEGORIES:
+        for period in PERIODS:
+            for date in dates:
+                key, spent = app.window_spend(cursor, category, period, date)
+                expected_key = window_key(period, datetime.date.fromisoformat(date))
+                if key != expected_key:
+                    failures.append(f"window_spend({category}, {period}, {date}) key: {key} != {expected_key}")
+                check(f"window_spend({category}, {period}, {date})", spent,
+                      model.window_spend(category, period, date))
+    failures += check_aggregates(app, cursor)
+    return failures
+
+
+def run_flows(database_path, steps, seed):
+    app = load_app(database_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.setup_database()
+    cursor, db = app.database_connect()
+    cursor.execute('''INSERT INTO fx_rates(currency, date, rate) VALUES ('EUR', '2023-01-01', ?)''', (EUR_RATE,))
+    db.commit()
+    model = Model(cursor)
+    rng = random.Random(seed)
+    try:
+        for step in range(1, steps + 1):
+            random_step(app, cursor, model, rng)
+            if step % CHECK_EVERY == 0 or step == steps:
+                failures = compare(app, cursor, model, rng)
+                if failures:
+                    return [f"step {step}: {failure}" for failure in failures]
+        return []
+    finally:
+        db.close()
+
+
+class GeneratedFlowTests(unittest.TestCase):
+    def test_on_disk(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for seed in range(SEEDS):
+                with self.subTest(seed=seed):
+                    self.assertEqual(run_flows(os.path.join(directory, f"flows_{seed}.db"), STEPS, seed), [])
+
+    def test_in_memory(self):
+        for seed in range(SEEDS):
+            with self.subTest(seed=seed):
+                # A shared-cache in-memory database lives as long as one connection to it.
+                memory_path = f"file:data_layer_{seed}?mode=memory&cache=shared"
+                keep_alive = sqlite3.connect(memory_path, uri=True)
+                try:
+                    self.assertEqual(run_flows(memory_path, STEPS, seed), [])
+                finally:
+                    keep_alive.close()
+
+
+# ------- Single flows -------
+class MenuTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.app = load_app(os.path.join(directory.name, "tracker.db"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.app.setup_database()
+        self.cursor, self.db = self.app.database_connect()
+        self.addCleanup(self.db.close)
+
+    def expense_amount(self, expense_id):
+        self.cursor.execute('''SELECT expense_amount FROM expense_tracker WHERE id = ?''', (expense_id,))
+        return self.cursor.fetchone()[0]
+
+    def test_amount_below_split_total_is_refused(self):
+        run_menu(self.app.add_expense, "2024-06-10", "Weekly shop", "Food", "", "100")
+        expense_id = latest_id(self.cursor, "expense_tracker")
+        run_menu(self.app.view_expenses, "Y", str(expense_id), "6", "Gifts", "60", "N")
+
+        output = run_menu(self.app.view_expenses, "Y", str(expense_id), "4", "20", "N")
+        self.assertIn("cannot be lower", output)
+        self.assertEqual(self.expense_amount(expense_id), 100)
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.cursor.execute('''UPDATE expense_tracker SET expense_amount = 20 WHERE id = ?''', (expense_id,))
+        self.db.rollback()
+
+        run_menu(self.app.view_expenses, "Y", str(expense_id), "4", "60", "N")
+        self.assertEqual(self.expense_amount(expense_id), 60)
+        self.assertEqual(self.app.window_spend(self.cursor, "Food", "monthly", "2024-06-10")[1], 0)
+        self.assertEqual(check_aggregates(self.app, self.cursor), [])
+
+    def test_week_across_new_year_is_one_window(self):
+        run_menu(self.app.add_expense, "2024-12-30", "Train ticket", "Travel", "", "40")
+        run_menu(self.app.add_expense, "2025-01-05", "Train ticket home", "Travel", "", "35")
+        self.assertEqual(self.app.window_spend(self.cursor, "Travel", "weekly", "2025-01-01"), ("2024-12-30", 75))
+        self.assertEqual(self.app.window_spend(self.cursor, "Travel", "weekly", "2025-01-06"), ("2025-01-06", 0))
+        self.assertEqual(check_aggregates(self.app, self.cursor), [])
+
+    def test_category_case_does_not_split_budgets(self):
+        run_menu(self.app.add_expense, "2024-06-10", "Weekly shop", "Food", "", "40")
+        expense_id = latest_id(self.cursor, "expense_tracker")
+        run_menu(self.app.view_expenses, "Y", str(expense_id), "3", "food", "N")
+        self.cursor.execute('''SELECT expense_category FROM expense_tracker WHERE id = ?''', (expense_id,))
+        self.assertEqual(self.cursor.fetchone()[0], "Food")
+
+        # Rows written outside the menus may still be in any case.
+        self.cursor.execute('''
+                            INSERT INTO expense_tracker(date, description, expense_category, expense_amount)
+                            VALUES ('2024-06-11', 'Corner shop', 'FOOD', 10)''')
+        self.db.commit()
+        self.assertEqual(self.app.window_spend(self.cursor, "Food", "monthly", "2024-06-10"), ("2024-06", 50))
+        self.assertEqual(self.app.window_spend(self.cursor, "food", "rolling_30", "2024-06-11")[1], 50)
+        self.assertEqual(check_aggregates(self.app, self.cursor), [])
+
+    def test_one_alert_when_both_thresholds_are_crossed(self):
+        self.cursor.execute('''INSERT INTO budget_tracker(expense_category, budget, period) VALUES ('Travel', 100, 'weekly')''')
+        self.db.commit()
+        run_menu(self.app.add_expense, "2024-06-10", "Flight", "Travel", "", "150")
+        self.assertEqual(self.app.check_budget_alerts(self.cursor, self.db, "Travel", "2024-06-10"), [])
+        self.cursor.execute('''SELECT threshold FROM budget_alerts WHERE expense_category = 'Travel' ORDER BY threshold''')
+        self.assertEqual(self.cursor.fetchall(), [(0.8,), (1.0,)])
+
+        self.cursor.execute('''DELETE FROM budget_alerts''')
+        self.db.commit()
+        with contextlib.redirect_stdout(io.StringIO()):
+            alerts = self.app.check_budget_alerts(self.cursor, self.db, "Travel", "2024-06-10")
+        self.assertEqual(alerts, ["'Travel' has used 150% of its £100.0 budget per week."])
+
+    def test_date_edit_checks_split_categories(self):
+        self.cursor.execute('''INSERT INTO budget_tracker(expense_category, budget, period) VALUES ('Gifts', 50, 'monthly')''')
+        self.db.commit()
+        run_menu(self.app.add_expense, "2024-06-10", "Birthday dinner", "Food", "", "100")
+        expense_id = latest_id(self.cursor, "expense_tracker")
+        run_menu(self.app.view_expenses, "Y", str(expense_id), "6", "Gifts", "60", "N")
+        self.cursor.execute('''DELETE FROM budget_alerts''')
+        self.db.commit()
+
+        output = run_menu(self.app.view_expenses, "Y", str(expense_id), "1", "2024-08-10", "N")
+        self.assertIn("'Gifts' has used 120%", output)
+        self.cursor.execute('''SELECT window_key FROM budget_alerts WHERE expense_category = 'Gifts' ''')
+        self.assertEqual({row[0] for row in self.cursor.fetchall()}, {"2024-08"})
+
+    def test_recategorise_covers_income_and_confirms_overwrites(self):
+        self.cursor.execute('''
+                            INSERT INTO expense_tracker(date, description, expense_category, expense_amount)
+                            VALUES ('2024-06-10', 'Marlowe deli lunch', 'Treats', 20)''')
+        self.cursor.execute('''
+                            INSERT INTO income_tracker(date, description, income_category, income_amount)
+                            VALUES ('2024-06-28', 'Acme payroll', 'Uncategorised', 2000)''')
+        self.db.commit()
+        self.app.add_category_rule(self.cursor, self.db, "marlowe", "Lunch")
+        self.app.add_category_rule(self.cursor, self.db, "payroll", "Salary", kind="income")
+
+        def categories():
+            self.cursor.execute('''SELECT expense_category FROM expense_tracker WHERE description = 'Marlowe deli lunch' ''')
+            expense_category = self.cursor.fetchone()[0]
+            self.cursor.execute('''SELECT income_category FROM income_tracker WHERE description = 'Acme payroll' ''')
+            return expense_category, self.cursor.fetchone()[0]
+
+        output = run_menu(self.app.manage_category_rules, "3")
+        self.assertIn("0 expenses and 1 income entries", output)
+        self.assertEqual(categories(), ("Treats", "Salary"))
+
+        output = run_menu(self.app.manage_category_rules, "4", "N")
+        self.assertIn("No categories have been changed", output)
+        self.assertEqual(categories(), ("Treats", "Salary"))
+
+        run_menu(self.app.manage_category_rules, "4", "Y")
+        self.assertEqual(categories(), ("Lunch", "Salary"))
+
+
+    def test_statement_goals_show_progress_at_month_end(self):
+        self.cursor.execute('''INSERT INTO financial_goals_tracker(goal, target_date, target_amount)
+                            VALUES ('Test holiday', '2090-12-31', 1000000)''')
+        goal_id = latest_id(self.cursor, "financial_goals_tracker")
+        self.cursor.executemany('''INSERT INTO goal_contributions(goal_id, date, amount) VALUES (?, ?, ?)''',
+                                [(goal_id, "2024-05-10", 200), (goal_id, "2024-06-10", 100)])
+        self.db.commit()
+
+        with tempfile.TemporaryDirectory() as directory:
+            with contextlib.redirect_stdout(io.StringIO()):
+                paths = self.app.generate_monthly_statements(formats=("csv",), directory=directory)
+            months = sorted(os.path.basename(path)[len("statement-"):-len(".csv")] for path in paths)
+            lines = {}
+            for month in ("2024-05", "2024-06", months[-1]):
+                with open(os.path.join(directory, f"statement-{month}.csv")) as statement:
+                    lines[month] = next(line.split(",") for line in statement
+                                        if line.startswith("Financial Goals,Test holiday,"))
+
+        self.assertEqual(lines["2024-06"][4], "100.00")
+        self.assertGreaterEqual(float(lines["2024-06"][5]), float(lines["2024-05"][5]) + 100)
+        self.cursor.execute('''SELECT * FROM financial_goals_tracker ORDER BY target_date''')
+        progress = [goal for goal in self.app.calculate_goal_progress(self.cursor, self.cursor.fetchall())
+                    if goal["id"] == goal_id][0]
+        self.assertEqual(lines[months[-1]][5], f"{progress['saved']:.2f}")
+        self.assertEqual(lines[months[-1]][7].strip(), "Yes" if progress["on_track"] else "No")
+
+
+if __name__ == "__main__":
+    unittest.main()
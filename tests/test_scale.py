@@ -0,0 +1,137 @@
+# ========== Scale Tests ==========
+# Key operations are timed against a generated database of expenses. Each one
+# has a time budget, and streaming every expense and checking the stored
+# totals also have memory budgets. Building the database takes a while, so
+# these tests only run when TRACKER_SCALE_ROWS is set.
+#
+# Usage: TRACKER_SCALE_ROWS=1000000 python -m pytest tests/test_scale.py
+import datetime
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import unittest
+
+from tracker_fixtures import build_database, check_aggregates, load_app
+
+
+ROWS = int(os.environ.get("TRACKER_SCALE_ROWS") or 0)
+
+# Seconds, per row for the per-row operations.
+TIME_BUDGETS = {
+    "insert expense (per row)": 0.0002,
+    "window_spend (per budget)": 0.002,
+    "check_new_expense": 0.1,
+    "add_expense_split (per split)": 0.005,
+    "find_expenses_by_tag": 0.2,
+    "rename category": 5.0,
+    "delete expense (per row)": 0.001,
+    "total_net_income": 5.0,
+    "load_monthly_aggregates": 10.0,
+    "stream all expenses": 5.0,
+    "check_aggregates": 15.0,
+}
+# Peak bytes allocated by Python while the operation runs.
+MEMORY_BUDGETS = {
+    "stream all expenses": 5 * 1024 * 1024,
+    "check_aggregates": 100 * 1024 * 1024,
+}
+
+
+# Time an operation, then run it again under tracemalloc if its memory is
+# budgeted too, since tracing slows every allocation.
+def measure(results, name, operation, per=1):
+    start = time.perf_counter()
+    value = operation()
+    seconds = (time.perf_counter() - start) / per
+    peak = None
+    if name in MEMORY_BUDGETS:
+        tracemalloc.start()
+        operation()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    results[name] = (seconds, peak)
+    return value
+
+
+@unittest.skipUnless(ROWS, "set TRACKER_SCALE_ROWS to run the scale tests")
+class ScaleTests(unittest.TestCase):
+    def test_operations_within_budgets(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database_path = os.path.join(directory, "scale.db")
+            build_database(database_path, ROWS)
+            app = load_app(database_path)
+            cursor, db = app.database_connect()
+            try:
+                results = {}
+                problems = self.run_operations(app, cursor, db, results)
+            finally:
+                db.close()
+
+        self.assertEqual(problems, [])
+        for name, (seconds, peak) in results.items():
+            with self.subTest(operation=name):
+                self.assertLessEqual(seconds, TIME_BUDGETS[name])
+                if peak is not None:
+                    self.assertLessEqual(peak, MEMORY_BUDGETS[name])
+
+    def run_operations(self, app, cursor, db, results):
+        rng = random.Random(0)
+
+        def insert_expenses(count=10000):
+            for row in range(count):
+                date = datetime.date(2020, 1, 1) + datetime.timedelta(days=rng.randrange(5 * 365))
+                cursor.execute('''
+                               INSERT INTO expense_tracker
+                               (date, description, expense_category, expense_amount, currency)
+                               VALUES (?, ?, ?, ?, 'GBP')''',
+                               (date.isoformat(), f"Scale expense {row}", "Category 0", 12.5))
+            db.commit()
+        measure(results, "insert expense (per row)", insert_expenses, per=10000)
+
+        cursor.execute('''SELECT expense_category, period FROM budget_tracker''')
+        budgets = cursor.fetchall()
+        measure(results, "window_spend (per budget)",
+                lambda: [app.window_spend(cursor, category, period, "2022-06-15") for category, period in budgets],
+                per=len(budgets))
+        measure(results, "check_new_expense",
+                lambda: app.check_new_expense(cursor, "2022-06-15", "Scale expense", "Category 1", 25.0, "GBP"))
+
+        cursor.execute('''SELECT id FROM expense_tracker ORDER BY random() LIMIT 10000''')
+        sample_ids = [row[0] for row in cursor.fetchall()]
+        measure(results, "add_expense_split (per split)",
+                lambda: [app.add_expense_split(cursor, db, expense_id, "Category 2", 0.5)
+                         for expense_id in sample_ids[:100]],
+                per=100)
+        for expense_id in sample_ids:
+            app.tag_expense(cursor, db, expense_id, ["scale"])
+        measure(results, "find_expenses_by_tag", lambda: sum(1 for expense in app.find_expenses_by_tag(cursor, "scale")))
+
+        def rename():
+            cursor.execute('''UPDATE expense_tracker SET expense_category = 'Renamed'
+                           WHERE expense_category = 'Category 3' ''')
+            cursor.execute('''UPDATE expense_splits SET expense_category = 'Renamed'
+                           WHERE expense_category = 'Category 3' ''')
+            db.commit()
+        measure(results, "rename category", rename)
+
+        def delete_expenses():
+            for expense_id in sample_ids[-1000:]:
+                cursor.execute('''DELETE FROM expense_tracker where id = ?''', (expense_id,))
+            db.commit()
+        measure(results, "delete expense (per row)", delete_expenses, per=1000)
+
+        measure(results, "total_net_income", app.total_net_income)
+        measure(results, "load_monthly_aggregates", lambda: app.load_monthly_aggregates(cursor))
+
+        def stream_expenses():
+            cursor.execute('''SELECT id, date, description, expense_category, expense_amount, currency
+                           FROM expense_tracker''')
+            return sum(1 for expense in app.stream_rows(cursor, app.ExpenseRecord))
+        measure(results, "stream all expenses", stream_expenses)
+        return measure(results, "check_aggregates", lambda: check_aggregates(app, cursor))
+
+
+if __name__ == "__main__":
+    unittest.main()
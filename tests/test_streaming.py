@@ -0,0 +1,53 @@
+# ========== Streaming Tests ==========
+# Listing a category's expenses streams them through stream_rows, so the peak
+# memory of the listing should stay the same however many expenses there are.
+# The menu is run for N and 10 x N expenses and the two peaks are compared.
+import contextlib
+import os
+import tempfile
+import tracemalloc
+import unittest
+from unittest import mock
+
+from tracker_fixtures import load_app
+
+
+ROWS = 5000
+# The larger listing may use at most this much more memory at its peak.
+PEAK_GROWTH = 1.25
+
+
+class StreamingTests(unittest.TestCase):
+    def peak_listing_memory(self, rows):
+        with tempfile.TemporaryDirectory() as directory:
+            app = load_app(os.path.join(directory, "tracker.db"))
+            with contextlib.redirect_stdout(open(os.devnull, "w")) as output:
+                app.setup_database()
+                cursor, db = app.database_connect()
+                cursor.executemany('''
+                                   INSERT INTO expense_tracker(date, description, expense_category, expense_amount)
+                                   VALUES (date('2024-01-01', ? || ' days'), ?, 'Streamed', 9.99)''',
+                                   ((row % 366, f"Streamed expense {row}") for row in range(rows)))
+                db.commit()
+                db.close()
+
+                answers = iter(["Streamed", "N"])
+                with mock.patch("builtins.input", lambda prompt="": next(answers)):
+                    tracemalloc.start()
+                    try:
+                        app.view_category_expenses()
+                        peak = tracemalloc.get_traced_memory()[1]
+                    finally:
+                        tracemalloc.stop()
+                output.close()
+        return peak
+
+    def test_peak_memory_does_not_grow_with_rows(self):
+        small = self.peak_listing_memory(ROWS)
+        large = self.peak_listing_memory(10 * ROWS)
+        self.assertLess(large, small * PEAK_GROWTH,
+                        f"peak grew from {small:,} bytes for {ROWS:,} rows to {large:,} for {10 * ROWS:,}")
+
+
+if __name__ == "__main__":
+    unittest.main()
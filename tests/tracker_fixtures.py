@@ -0,0 +1,139 @@
+# ========== Test Fixtures ==========
+# Shared by the tests and the benchmarks: loading the tracker against a given
+# database, building a large generated database, and check_aggregates, which
+# compares the totals kept by triggers with a fresh recomputation.
+import importlib.util
+import os
+import random
+import sys
+from unittest import mock
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+APP_PATH = os.path.join(ROOT, "Expense and Budget Tracker App.py")
+BUILD_CATEGORIES = 40
+AGGREGATE_TOLERANCE = 0.005
+
+
+# The tracker reads TRACKER_DB when it is loaded, so it is only set for the
+# load. The tracker imports tracker_lookups from its own folder, which is not
+# on the path when run with plain pytest or from the benchmarks folder.
+def load_app(database_path):
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    with mock.patch.dict(os.environ, {"TRACKER_DB": database_path}):
+        spec = importlib.util.spec_from_file_location("tracker_app", APP_PATH)
+        app = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(app)
+    return app
+
+
+# A set-up database of random expenses over five years in BUILD_CATEGORIES
+# categories, each with a budget for every period.
+def build_database(database_path, expenses):
+    app = load_app(database_path)
+
+    # Expenses go in before setup_database, so the window totals are built
+    # in one pass when their tables are created.
+    app.create_expense_table()
+    cursor, db = app.database_connect()
+    categories = [f"Category {number}" for number in range(BUILD_CATEGORIES)]
+    cursor.executemany('''
+                       INSERT INTO expense_tracker(date, description, expense_category, expense_amount)
+                       VALUES (date('2020-01-01', ? || ' days'), ?, ?, ?)''',
+                       ((random.randrange(5 * 365), f"Expense {row}", random.choice(categories),
+                         round(random.uniform(1, 200), 2)) for row in range(expenses)))
+    db.commit()
+    app.setup_database()
+    cursor.executemany('''INSERT OR IGNORE INTO budget_tracker(expense_category, budget, period) VALUES (?, ?, ?)''',
+                       ((category, 1000, period) for category in categories for period in app.BUDGET_PERIODS))
+    db.commit()
+    db.close()
+
+
+# The totals kept up to date by triggers (each expense's split_amount and the
+# budget window totals) are compared with a fresh recomputation from the
+# expense and split rows. Any difference means a write path has bypassed or
+# broken a trigger. Returns a list of problems, empty if all is well.
+def check_aggregates(app, cursor):
+    problems = []
+    cursor.execute('''
+                   SELECT expense_tracker.id, expense_tracker.split_amount, TOTAL(expense_splits.amount)
+                   FROM expense_splits JOIN expense_tracker ON expense_tracker.id = expense_splits.expense_id
+                   GROUP BY expense_tracker.id
+                   HAVING ABS(expense_tracker.split_amount - TOTAL(expense_splits.amount)) > ?
+                   UNION ALL
+                   SELECT id, split_amount, 0 FROM expense_tracker
+                   WHERE split_amount != 0 AND id NOT IN (SELECT expense_id FROM expense_splits)
+                   ''', (AGGREGATE_TOLERANCE,))
+    for expense_id, stored, expected in cursor.fetchall():
+        problems.append(f"Expense {expense_id} has a split amount of {stored} but its splits total {expected}.")
+
+    cursor.execute('''
+                   SELECT COUNT(*) FROM expense_splits
+                   WHERE expense_id NOT IN (SELECT id FROM expense_tracker)
+                   ''')
+    orphans = cursor.fetchone()[0]
+    if orphans:
+        problems.append(f"{orphans} split lines belong to expenses that no longer exist.")
+
+    cursor.execute('''
+                   SELECT id, expense_amount, split_amount FROM expense_tracker
+                   WHERE expense_amount < split_amount - ?
+                   ''', (AGGREGATE_TOLERANCE,))
+    for expense_id, amount, split_total in cursor.fetchall():
+        problems.append(f"Expense {expense_id} is for {amount} but its split lines total {split_total}, "
+                        f"leaving a negative remainder.")
+
+    # Rows stored before currencies without rates were refused cannot be
+    # converted, so every total leaves them out.
+    for table in ("expense_tracker", "income_tracker", "budget_tracker"):
+        cursor.execute(f'''
+                       SELECT currency, COUNT(*) FROM {table}
+                       WHERE currency IS NOT NULL AND currency != '{app.REPORTING_CURRENCY}'
+                       AND currency NOT IN (SELECT currency FROM fx_rates)
+                       GROUP BY currency
+                       ''')
+        for currency, count in cursor.fetchall():
+            problems.append(f"{count} rows in {table} are in '{currency}', which has no exchange rates, "
+                            f"so they are left out of every total.")
+
+    # Daily totals are recomputed in one pass over expense_lines, and the wider
+    # windows are summed from them.
+    cursor.execute('''DROP TABLE IF EXISTS temp.expected_window_totals''')
+    cursor.execute('''
+                   CREATE TEMP TABLE expected_window_totals(
+                   expense_category, granularity, window_key, total)
+                   ''')
+    cursor.execute('''INSERT INTO expected_window_totals''' + app.window_totals_select("daily"))
+    for granularity, key in app.WINDOW_KEYS.items():
+        if granularity != "daily":
+            cursor.execute(f'''
+                           INSERT INTO expected_window_totals
+                           SELECT expense_category, '{granularity}', {key.format(date="window_key")}, TOTAL(total)
+                           FROM expected_window_totals WHERE granularity = 'daily'
+                           GROUP BY expense_category, {key.format(date="window_key")}
+                           ''')
+
+    for granularity in app.WINDOW_KEYS:
+        cursor.execute('''
+                       SELECT expense_category, window_key, total FROM expected_window_totals
+                       WHERE granularity = ?
+                       ''', (granularity,))
+        expected = {(category, window_key): total for category, window_key, total in cursor}
+        cursor.execute('''
+                       SELECT expense_category, window_key, total FROM budget_window_totals
+                       WHERE granularity = ?
+                       ''', (granularity,))
+        stored = {(category, window_key): total for category, window_key, total in cursor}
+        for category, window_key in sorted(expected.keys() | stored.keys(), key=repr):
+            stored_total = stored.get((category, window_key)) or 0
+            expected_total = expected.get((category, window_key)) or 0
+            if abs(stored_total - expected_total) > AGGREGATE_TOLERANCE:
+                problems.append(f"'{category}' has a {granularity} total of {round(stored_total, 2)} for "
+                                f"{window_key} but its expenses total {round(expected_total, 2)}.")
+    cursor.execute('''DROP TABLE temp.expected_window_totals''')
+    # Filling the temp table opened a transaction, which would otherwise keep
+    # other connections from writing.
+    cursor.connection.commit()
+    return problems
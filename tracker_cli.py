@@ -0,0 +1,69 @@
+# ========== Expense and Budget Tracker Command Line ==========
+# Non-interactive entry point for cron jobs and shell scripts. Every
+# subcommand writes a single JSON document to stdout. Anything the tracker
+# itself prints (alerts, setup messages) is sent to stderr so the JSON stays
+# machine-readable. Errors are reported as {"error": "..."} with exit status 1,
+# as are results with "ok": false.
+#
+# Usage: python tracker_cli.py <command> [options]
+#        python tracker_cli.py <command> --help
+#
+# The database is chosen with the TRACKER_DB environment variable, as for the
+# interactive app.
+import contextlib
+import importlib
+import json
+import sqlite3
+import sys
+
+
+# Subcommand name -> (module in tracker_commands, summary). Modules are only
+# imported for the subcommand being run.
+COMMANDS = {
+    "add-expense": ("add_expense", "Record a new expense"),
+    "add-income": ("add_income", "Record a new income"),
+    "budget-status": ("budget_status", "Show spending against every budget"),
+    "summary": ("summary", "Show income and spending by category for a month"),
+    "import": ("import_transactions", "Import expenses or income from a CSV file"),
+}
+
+
+def usage():
+    lines = ["usage: tracker_cli.py <command> [options]", "", "commands:"]
+    lines += [f"  {name:<15} {summary}" for name, (module, summary) in COMMANDS.items()]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    if argv[0] not in COMMANDS:
+        print(f"{usage()}\n\nUnknown command '{argv[0]}'.", file=sys.stderr)
+        return 2
+
+    import argparse
+    name = argv[0]
+    module_name, summary = COMMANDS[name]
+    command = importlib.import_module(f"tracker_commands.{module_name}")
+    parser = argparse.ArgumentParser(prog=f"tracker_cli.py {name}", description=summary)
+    command.add_arguments(parser)
+    args = parser.parse_args(argv[1:])
+
+    from tracker_commands import ensure_database
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            ensure_database()
+            result = command.run(args)
+        status = 1 if isinstance(result, dict) and result.get("ok") is False else 0
+    except (sqlite3.Error, OSError, ValueError, KeyError) as e:
+        result = {"error": str(e)}
+        status = 1
+    json.dump(result, sys.stdout, default=str)
+    sys.stdout.write("\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
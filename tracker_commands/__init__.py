@@ -0,0 +1,60 @@
+# ========== Command-line Subcommands ==========
+# Each subcommand of tracker_cli.py lives in its own module in this package and
+# provides add_arguments(parser) and run(args). run returns a value that can be
+# written out as JSON. Modules are only imported when their subcommand is used,
+# and only commands that need the whole tracker load it with load_app(), so a
+# call pays for the code it runs and nothing else. budget-status reads through
+# tracker_lookups alone.
+import contextlib
+import datetime
+import importlib.util
+import os
+
+import tracker_lookups
+
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Expense and Budget Tracker App.py")
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("tracker_app", APP_PATH)
+    app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app)
+    return app
+
+
+# Set up a new or older database, and reload exchange rates if the rate files
+# have changed since they were last loaded. An up-to-date database is only
+# read, and the tracker itself is only loaded when there is work to do.
+def ensure_database():
+    with contextlib.closing(tracker_lookups.connect()) as db:
+        settings = tracker_lookups.get_settings(db.cursor())
+    fingerprint = tracker_lookups.rate_files_fingerprint()
+    if settings.get(tracker_lookups.SCHEMA_VERSION_SETTING) != tracker_lookups.SCHEMA_VERSION:
+        load_app().setup_database()
+    elif fingerprint is not None and settings.get(tracker_lookups.FX_RATE_FILES_SETTING) != fingerprint:
+        load_app().load_fx_rates()
+
+
+def today():
+    return datetime.date.today().isoformat()
+
+
+def valid_date(value):
+    datetime.datetime.strptime(value, '%Y-%m-%d')
+    return value
+
+
+# A currency code, defaulting to the reporting currency. Currencies without
+# exchange rates are refused, as the database triggers would refuse them.
+def check_currency(cursor, currency):
+    currency = (currency or tracker_lookups.REPORTING_CURRENCY).strip().upper()
+    if currency != tracker_lookups.REPORTING_CURRENCY:
+        cursor.execute('''SELECT 1 FROM fx_rates WHERE currency = ? LIMIT 1''', (currency,))
+        if not cursor.fetchone():
+            raise ValueError(f"No exchange rates found for '{currency}'")
+    return currency
+
+
+def round_amount(amount):
+    return round(amount or 0, 2)
+
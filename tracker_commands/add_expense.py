@@ -0,0 +1,35 @@
+# ------- add-expense -------
+# Record one expense, auto-categorising it when no category is given. Possible
+# duplicates and unusual spending are reported as warnings, and any budget
+# alerts it raises are returned alongside the saved expense.
+from tracker_commands import check_currency, load_app, today, valid_date
+
+
+def add_arguments(parser):
+    parser.add_argument("--date", type=valid_date, default=None,
+                        help="date of the expense [yyyy-mm-dd] (default: today)")
+    parser.add_argument("--description", required=True, help="short description of the expense")
+    parser.add_argument("--amount", type=float, required=True, help="expense amount")
+    parser.add_argument("--category", help="expense category (default: auto-categorise)")
+    parser.add_argument("--currency", help="currency code (default: the reporting currency)")
+    parser.add_argument("--strict", action="store_true",
+                        help="do not save the expense if it raises any warnings")
+
+
+def run(args):
+    app = load_app()
+    cursor, db = app.database_connect()
+    try:
+        date = args.date or today()
+        currency = check_currency(cursor, args.currency)
+        description, category, warnings = app.prepare_expense(cursor, date, args.description, args.category,
+                                                              args.amount, currency)
+        expense = {"date": date, "description": description, "category": category,
+                   "amount": args.amount, "currency": currency}
+        if warnings and args.strict:
+            return {"saved": False, "expense": expense, "warnings": warnings, "alerts": []}
+
+        expense_id, alerts = app.save_expense(cursor, db, date, description, category, args.amount, currency)
+        return {"saved": True, "expense": {"id": expense_id, **expense}, "warnings": warnings, "alerts": alerts}
+    finally:
+        db.close()
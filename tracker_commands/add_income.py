@@ -0,0 +1,26 @@
+# ------- add-income -------
+# Record one income, auto-categorising it when no category is given.
+from tracker_commands import check_currency, load_app, today, valid_date
+
+
+def add_arguments(parser):
+    parser.add_argument("--date", type=valid_date, default=None,
+                        help="date of the income [yyyy-mm-dd] (default: today)")
+    parser.add_argument("--description", required=True, help="short description of the income")
+    parser.add_argument("--amount", type=float, required=True, help="income amount")
+    parser.add_argument("--category", help="income category (default: auto-categorise)")
+    parser.add_argument("--currency", help="currency code (default: the reporting currency)")
+
+
+def run(args):
+    app = load_app()
+    cursor, db = app.database_connect()
+    try:
+        date = args.date or today()
+        currency = check_currency(cursor, args.currency)
+        income_id, description, category = app.save_income(cursor, db, date, args.description, args.category,
+                                                           args.amount, currency)
+        return {"saved": True, "income": {"id": income_id, "date": date, "description": description,
+                                          "category": category, "amount": args.amount, "currency": currency}}
+    finally:
+        db.close()
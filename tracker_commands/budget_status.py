@@ -0,0 +1,43 @@
+# ------- budget-status -------
+# Spend against every budget for the window containing a date. Each budget is
+# one lookup in the running window totals, so the cost does not grow with the
+# number of expenses recorded. Only tracker_lookups is used, so the command
+# neither loads the tracker nor writes to the database.
+import contextlib
+
+import tracker_lookups
+from tracker_commands import round_amount, today, valid_date
+
+
+def add_arguments(parser):
+    parser.add_argument("--date", type=valid_date, default=None,
+                        help="date whose budget windows are reported [yyyy-mm-dd] (default: today)")
+    parser.add_argument("--category", help="only report budgets for this category")
+
+
+def run(args):
+    date = args.date or today()
+    with contextlib.closing(tracker_lookups.connect()) as db:
+        cursor = db.cursor()
+        cursor.execute('''
+                       SELECT expense_category, budget, currency, period FROM budget_tracker
+                       WHERE ? IS NULL OR LOWER(expense_category) = LOWER(?)
+                       ORDER BY expense_category, period
+                       ''', (args.category, args.category))
+        budgets = cursor.fetchall()
+
+        status = []
+        for category, budget_amount, budget_currency, period in budgets:
+            budget_amount = float(budget_amount or 0) * tracker_lookups.exchange_rate(cursor, budget_currency, date)
+            window_key, spent = tracker_lookups.window_spend(cursor, category, period, date)
+            status.append({
+                "category": category,
+                "period": period,
+                "window": window_key,
+                "budget": round_amount(budget_amount),
+                "spent": round_amount(spent),
+                "remaining": round_amount(budget_amount - spent),
+                "percent_used": round(spent / budget_amount * 100, 1) if budget_amount > 0 else None,
+                "over_budget": budget_amount > 0 and spent > budget_amount,
+            })
+        return {"date": date, "currency": tracker_lookups.REPORTING_CURRENCY, "budgets": status}
@@ -0,0 +1,98 @@
+# ------- import -------
+# Import expenses or income from a CSV file with a 'date,description,amount'
+# header and optional 'category' and 'currency' columns. Rows without a
+# category are auto-categorised, and rows in a currency without exchange rates
+# are reported as errors. Rows are written through a WriteQueue, so the whole
+# file is committed in a few batches rather than one commit per row, and a bad
+# row is reported without undoing the others. Expenses are checked for
+# duplicates and unusual spending as they are read, and budget alerts are
+# raised once the file is written, once per budget window the file touched.
+import csv
+
+from tracker_commands import check_currency, load_app, valid_date
+
+
+def add_arguments(parser):
+    parser.add_argument("file", help="CSV file to import")
+    parser.add_argument("--kind", choices=("expense", "income"), default="expense",
+                        help="whether the rows are expenses or income (default: expense)")
+
+
+def read_rows(app, cursor, file_name, kind):
+    rules = app.get_category_rules(cursor, kind)
+    with open(file_name, newline='') as transactions_file:
+        for line, row in enumerate(csv.DictReader(transactions_file), start=2):
+            try:
+                date = valid_date(row["date"].strip())
+                description = row["description"].strip().capitalize()
+                amount = float(row["amount"])
+                category = (row.get("category") or "").strip().title()
+                if not category:
+                    category = app.categorise(rules, description, amount) or app.UNCATEGORISED
+                currency = check_currency(cursor, row.get("currency"))
+            except (KeyError, ValueError, AttributeError) as e:
+                yield line, None, f"{type(e).__name__}: {e}"
+                continue
+            yield line, (date, description, category, amount, currency), None
+
+
+# One date per budget window of each category the imported expenses fall in,
+# so each window is checked once however many rows it received.
+def alert_dates(app, cursor, expenses):
+    dates = set()
+    for category in {category for category, date in expenses}:
+        category_dates = sorted(date for expense_category, date in expenses if expense_category == category)
+        for budget in app.get_category_budgets(cursor, category):
+            period = budget[4]
+            if period not in app.WINDOW_KEYS:
+                dates.update((category, date) for date in category_dates)
+                continue
+            latest = {}
+            for date in category_dates:
+                cursor.execute(f'''SELECT {app.WINDOW_KEYS[period].format(date="?")}''', (date,))
+                latest[cursor.fetchone()[0]] = date
+            dates.update((category, date) for date in latest.values())
+    return sorted(dates)
+
+
+def run(args):
+    app = load_app()
+    submit = app.submit_expense if args.kind == "expense" else app.submit_income
+    cursor, db = app.database_connect()
+    try:
+        pending = []
+        errors = []
+        warnings = []
+        first_lines = {}
+        with app.WriteQueue() as write_queue:
+            for line, values, error in read_rows(app, cursor, args.file, args.kind):
+                if error:
+                    errors.append({"line": line, "error": error})
+                    continue
+                if args.kind == "expense":
+                    # Earlier rows of the file may not be committed yet, so
+                    # repeats within the file are matched here.
+                    row_warnings = app.check_new_expense(cursor, *values)
+                    date, description, category, amount, currency = values
+                    first_line = first_lines.setdefault((date, description.lower(), amount, currency), line)
+                    if first_line != line:
+                        row_warnings.append(f"Possible duplicate of line {first_line}.")
+                    if row_warnings:
+                        warnings.append({"line": line, "warnings": row_warnings})
+                pending.append((line, values, submit(write_queue, *values)))
+
+        imported = []
+        for line, values, future in pending:
+            if future.exception() is not None:
+                errors.append({"line": line, "error": str(future.exception())})
+            else:
+                imported.append(values)
+
+        alerts = []
+        if args.kind == "expense":
+            for category, date in alert_dates(app, cursor, {(values[2], values[0]) for values in imported}):
+                alerts += app.check_budget_alerts(cursor, db, category, date)
+        return {"file": args.file, "kind": args.kind, "imported": len(imported),
+                "errors": errors, "warnings": warnings, "alerts": alerts}
+    finally:
+        db.close()
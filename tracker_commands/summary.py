@@ -0,0 +1,42 @@
+# ------- summary -------
+# Income and spending by category for one month, in the reporting currency,
+# using the same monthly aggregates as the statements.
+import datetime
+
+from tracker_commands import load_app, round_amount
+
+
+def valid_month(value):
+    datetime.datetime.strptime(value, '%Y-%m')
+    return value
+
+
+def add_arguments(parser):
+    parser.add_argument("--month", type=valid_month, default=None,
+                        help="month to summarise [yyyy-mm] (default: this month)")
+
+
+def run(args):
+    app = load_app()
+    month = args.month or datetime.date.today().strftime('%Y-%m')
+    cursor, db = app.database_connect()
+    try:
+        rows = app.load_monthly_aggregates(cursor, month, month).get(month, [])
+    finally:
+        db.close()
+
+    income = {category: round_amount(total) for kind, category, total, *_ in rows if kind == "income"}
+    expenses = {category: round_amount(total) for kind, category, total, *_ in rows if kind == "expense"}
+    saved = sum(total or 0 for kind, category, total, *_ in rows if kind == "goal")
+    total_income = sum(income.values())
+    total_expenses = sum(expenses.values())
+    return {
+        "month": month,
+        "currency": app.REPORTING_CURRENCY,
+        "income": income,
+        "expenses": expenses,
+        "total_income": round_amount(total_income),
+        "total_expenses": round_amount(total_expenses),
+        "net_income": round_amount(total_income - total_expenses),
+        "saved_towards_goals": round_amount(saved),
+    }
@@ -0,0 +1,118 @@
+# ========== Expense and Budget Tracker Lookups ==========
+# Settings and read-only lookups shared by the tracker and its command line.
+# Everything here needs only sqlite3 and os, so a command that just reads
+# budgets (tracker_cli.py budget-status) can use it without loading the
+# whole tracker.
+import os
+import sqlite3
+
+
+# ------- Connecting to Database -------
+# TRACKER_DB may also be a SQLite URI, such as 'file:tracker?mode=memory&cache=shared'
+# for an in-memory database shared by every connection in the process.
+def database_path():
+    return os.environ.get("TRACKER_DB", "./tracker_app.db")
+
+
+def connect(path=None):
+    path = path or database_path()
+    return sqlite3.connect(path, uri=path.startswith("file:"))
+
+
+# ------- Settings -------
+# Values kept in tracker_settings. setup_database records SCHEMA_VERSION once
+# every table and migration is in place; raise it whenever setup_database
+# learns a new migration, so older databases are set up again.
+SCHEMA_VERSION = "1"
+SCHEMA_VERSION_SETTING = "schema_version"
+FX_RATE_FILES_SETTING = "fx_rate_files"
+
+
+def get_settings(cursor):
+    try:
+        cursor.execute('''SELECT name, value FROM tracker_settings''')
+    except sqlite3.OperationalError:
+        return {}
+    return dict(cursor.fetchall())
+
+
+# ------- Currencies -------
+# All totals are reported in this currency. Exchange rates are read from CSV
+# files in FX_RATES_DIRECTORY with a 'date,currency,rate' header, where rate is
+# the value of one unit of the currency in the reporting currency.
+REPORTING_CURRENCY = "GBP"
+FX_RATES_DIRECTORY = "./fx_rates"
+
+
+# The names, sizes and modification times of the rate files, or None if there
+# is no rates folder. Rates are only reloaded when this changes.
+def rate_files_fingerprint(directory=FX_RATES_DIRECTORY):
+    if not os.path.isdir(directory):
+        return None
+    files = []
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.endswith(".csv"):
+            status = os.stat(os.path.join(directory, file_name))
+            files.append(f"{file_name}:{status.st_size}:{status.st_mtime_ns}")
+    return f"{os.path.abspath(directory)}|" + "|".join(files)
+
+
+# Rate for one unit of a currency on a given date: the latest rate on or before
+# the date, or the earliest one after it. A currency with no rates at all
+# raises ValueError rather than being treated as the reporting currency.
+def exchange_rate(cursor, currency, date):
+    if currency is None or currency == REPORTING_CURRENCY:
+        return 1.0
+    cursor.execute('''SELECT COALESCE(
+                          (SELECT rate FROM fx_rates WHERE currency = ? AND date <= ?
+                           ORDER BY date DESC LIMIT 1),
+                          (SELECT rate FROM fx_rates WHERE currency = ? AND date > ?
+                           ORDER BY date LIMIT 1))''',
+                   (currency, date, currency, date))
+    rate = cursor.fetchone()[0]
+    if rate is None:
+        raise ValueError(f"No exchange rates found for '{currency}'")
+    return rate
+
+
+# ------- Budget windows -------
+# Budgets run per week, month, quarter or rolling 30 days. Weeks run Monday to
+# Sunday and are keyed by the date of their Monday, so a week spanning New Year
+# stays in one window. WINDOW_KEYS gives the SQL key of the window containing
+# a date for each granularity the running totals are kept at.
+BUDGET_PERIODS = {
+    "weekly": ("week", "Spent This Week"),
+    "monthly": ("month", "Spent This Month"),
+    "quarterly": ("quarter", "Spent This Quarter"),
+    "rolling_30": ("30 days", "Spent in Last 30 Days"),
+}
+ROLLING_BUDGET_DAYS = 30
+
+WINDOW_KEYS = {
+    "daily": "date({date})",
+    "weekly": "date({date}, 'weekday 0', '-6 days')",
+    "monthly": "strftime('%Y-%m', {date})",
+    "quarterly": "strftime('%Y', {date}) || '-Q' || ((CAST(strftime('%m', {date}) AS INTEGER) + 2) / 3)",
+}
+
+
+# Spend for the budget window of the given period that contains a date, with
+# the category matched regardless of case. Returns the window key and the
+# spend in the reporting currency.
+def window_spend(cursor, category, period, date):
+    if period == "rolling_30":
+        cursor.execute(f'''
+                       SELECT TOTAL(total) FROM budget_window_totals
+                       WHERE expense_category = LOWER(?) AND granularity = 'daily'
+                       AND window_key BETWEEN date(?, '-{ROLLING_BUDGET_DAYS - 1} days') AND date(?)
+                       ''', (category, date, date))
+        return date, cursor.fetchone()[0]
+
+    cursor.execute(f'''
+                   SELECT {WINDOW_KEYS[period].format(date=":date")},
+                   (SELECT total FROM budget_window_totals
+                    WHERE expense_category = LOWER(:category) AND granularity = :period
+                    AND window_key = {WINDOW_KEYS[period].format(date=":date")})
+                   ''', {"date": date, "category": category, "period": period})
+    window_key, spent = cursor.fetchone()
+    return window_key, spent or 0